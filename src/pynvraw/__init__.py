@@ -1,22 +1,63 @@
-'''User-facing API for working with pynvraw.'''
-from .nvapi_api import NvAPI
-from .status import NvError, NvStatus
+'''User-facing API for working with pynvraw.
 
-from .gpu import Gpu, Clocks
+Importing the package has no side effects: nvapi is loaded and initialized when `api` is first accessed
+(or an NvAPI is created), and submodules behind exported names are imported on first use.
+'''
+import importlib
+import threading
 
-api = NvAPI()
+_lazy = {
+    'NvAPI': '.nvapi_api',
+    'NvError': '.status',
+    'NvStatus': '.status',
+    'Gpu': '.gpu',
+    'Clocks': '.gpu',
+    'GpuReading': '.gpu',
+    'READ_FIELDS': '.gpu',
+    'GpuRegistry': '.registry',
+}
+_api = None
+_api_lock = threading.Lock()
+_registry = None
 
-def get_phys_gpu(cuda_dev: int) -> Gpu:
-    from .cuda_api import get_cuda_bus_slot
-    busId, slotId = get_cuda_bus_slot(cuda_dev)
+def _get_api() -> 'NvAPI':
+    global _api
+    if _api is None:
+        with _api_lock:
+            if _api is None:
+                from .nvapi_api import NvAPI
+                _api = NvAPI()
+    return _api
 
-    return Gpu(api.get_gpu_by_bus(busId, slotId), api)
+def __getattr__(name: str):
+    if name == 'api':
+        return _get_api()
+    module = _lazy.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+def get_registry() -> 'GpuRegistry':
+    '''Returns registry of the Gpu objects of `api`, the same ones get_gpus() and get_phys_gpu() return.'''
+    global _registry
+    if _registry is None:
+        api = _get_api()
+        from .registry import GpuRegistry
+        with _api_lock:
+            if _registry is None:
+                _registry = GpuRegistry(api)
+    return _registry
+
+def get_phys_gpu(cuda_dev: int) -> 'Gpu':
+    return get_registry().by_cuda(cuda_dev)
 
 def get_gpus():
-    try:
-        return get_gpus._gpu_cache
-    except AttributeError:
-        get_gpus._gpu_cache = tuple(Gpu(g, api) for g in api.gpu_handles)
-        return get_gpus._gpu_cache
+    return get_registry().gpus
 
-__all__ = ['api', 'Gpu', 'Clocks', 'NvError', 'NvStatus', 'get_phys_gpu', 'get_gpus']
+__all__ = ['api', 'Gpu', 'Clocks', 'GpuReading', 'READ_FIELDS', 'NvError', 'NvStatus', 'GpuRegistry',
+           'get_phys_gpu', 'get_gpus', 'get_registry']
@@ -0,0 +1,82 @@
+'''Asyncio API running blocking nvapi calls on a dedicated driver thread.'''
+
+import asyncio
+import concurrent.futures
+import functools
+import time
+import typing
+
+from .nvapi_api import NvAPI
+from .gpu import Gpu, GpuReading
+
+class AsyncNvAPI:
+    '''Asyncio front-end for NvAPI: every `get_*`-like method of NvAPI is available as a coroutine.
+
+    All calls are serialized on one worker thread, so the event loop never blocks in the driver.
+    Each call accepts a `timeout` keyword (defaulting to the one given here); note that on timeout
+    only the awaiting coroutine is cancelled, the driver call itself still runs to completion.
+    '''
+    def __init__(self, api: typing.Optional[NvAPI]=None, timeout: typing.Optional[float]=None):
+        if api is None:
+            from . import api
+        self.api = api
+        self.timeout = timeout
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='pynvraw-driver')
+
+    async def call(self, func: typing.Callable, *args, timeout: typing.Optional[float]=None, **kw):
+        '''Runs any blocking callable on the driver thread and returns its result.'''
+        future = asyncio.get_running_loop().run_in_executor(self.__executor, functools.partial(func, *args, **kw))
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout)
+
+    def __getattr__(self, name: str):
+        method = getattr(self.api, name)
+        if not callable(method):
+            raise AttributeError(f'{self.api.__class__.__name__}.{name} is not callable')
+        async def wrapper(*args, timeout: typing.Optional[float]=None, **kw):
+            return await self.call(method, *args, timeout=timeout, **kw)
+        wrapper.__name__ = name
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    def close(self):
+        self.__executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+class AsyncGpu:
+    '''Asyncio wrapper over Gpu which performs all its driver calls on the AsyncNvAPI thread.'''
+    def __init__(self, gpu: Gpu, driver: AsyncNvAPI):
+        self.gpu = gpu
+        self.driver = driver
+
+    async def read(self, *fields: str, timeout: typing.Optional[float]=None) -> GpuReading:
+        '''Asynchronous version of Gpu.read().'''
+        return await self.driver.call(self.gpu.read, *fields, timeout=timeout)
+
+    async def get(self, name: str, timeout: typing.Optional[float]=None):
+        '''Reads a Gpu property by its name, like `await agpu.get("core_temp")`.'''
+        return await self.driver.call(getattr, self.gpu, name, timeout=timeout)
+
+    async def stream(self, interval: float, *fields: str, timeout: typing.Optional[float]=None) -> typing.AsyncIterator[GpuReading]:
+        '''Yields a GpuReading of given fields every `interval` seconds, skipping ticks the consumer was too slow for.'''
+        start = time.monotonic()
+        tick = 0
+        while True:
+            yield await self.read(*fields, timeout=timeout)
+            tick = max(tick + 1, int((time.monotonic() - start) / interval) + 1)
+            await asyncio.sleep(max(start + tick * interval - time.monotonic(), 0))
+
+def get_async_gpus(driver: typing.Optional[AsyncNvAPI]=None) -> typing.Tuple[AsyncGpu]:
+    '''Wraps all GPUs of the system to AsyncGpu sharing one driver thread.'''
+    from . import get_gpus
+    if driver is None:
+        driver = AsyncNvAPI()
+    return tuple(AsyncGpu(gpu, driver) for gpu in get_gpus())
@@ -0,0 +1,87 @@
+'''Zero-copy NumPy views over fixed-layout nvapi struct arrays, with vectorized unit conversion.
+
+view() exposes any ctypes array of a struct (VFP curve points, boost table entries, power monitor channels)
+as a structured NumPy array sharing memory with it; the other functions convert raw driver units
+(kHz, uV, mW, 1/256 C) to the same units the struct properties return, for the whole array at once.
+'''
+
+import ctypes
+import typing
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .nvapi_api import NV_GPU_VFP_CURVE, NV_GPU_CLOCKBOOST_MASK, NV_GPU_CLOCKBOOST_TABLE, NV_GPU_THERMAL_EX, \
+        NV_POWER_MONITOR_STATUS
+
+# ctypes element type -> its NumPy dtype
+_dtypes = {}
+
+def _require():
+    if np is None:
+        raise ImportError('pynvraw.arrays requires numpy to be installed')
+
+def dtype_of(ctype: type) -> 'np.dtype':
+    '''Returns NumPy dtype with the same layout as given ctypes type (structured for structs).'''
+    _require()
+    dtype = _dtypes.get(ctype)
+    if dtype is None:
+        dtype = _dtypes[ctype] = np.dtype(ctype)
+    return dtype
+
+def view(array: ctypes.Array) -> 'np.ndarray':
+    '''Returns NumPy array sharing memory with a ctypes array, writes go both ways.'''
+    return np.frombuffer(array, dtype=dtype_of(array._type_))
+
+class VfpPoints(typing.NamedTuple):
+    type: 'np.ndarray'
+    frequency: 'np.ndarray' # MHz
+    voltage: 'np.ndarray' # V
+
+class BoostDeltas(typing.NamedTuple):
+    type: 'np.ndarray'
+    freq_delta: 'np.ndarray' # MHz
+
+class RailReadings(typing.NamedTuple):
+    channel: 'np.ndarray'
+    power: 'np.ndarray' # W
+    power_min: 'np.ndarray' # W
+    power_max: 'np.ndarray' # W
+    current: 'np.ndarray' # A
+    voltage: 'np.ndarray' # V
+    energy: 'np.ndarray' # raw driver counter
+
+def boost_mask(mask: NV_GPU_CLOCKBOOST_MASK) -> 'np.ndarray':
+    '''Returns bool array telling which of 255 curve points are enabled.'''
+    return view(mask.clocks)['enabled'].copy()
+
+def vfp_curve(curve: NV_GPU_VFP_CURVE, mask: typing.Optional[NV_GPU_CLOCKBOOST_MASK]=None) -> VfpPoints:
+    '''Converts VFP curve points, only those enabled in `mask` if it is given.'''
+    raw = view(curve.clocks)
+    if mask is not None:
+        raw = raw[boost_mask(mask)]
+    return VfpPoints(type=raw['_type'].copy(), frequency=raw['_frequency'] / 1000.0, voltage=raw['_voltage'] / 1000000.0)
+
+def boost_table(table: NV_GPU_CLOCKBOOST_TABLE, mask: typing.Optional[NV_GPU_CLOCKBOOST_MASK]=None) -> BoostDeltas:
+    '''Converts boost table frequency deltas, only of points enabled in `mask` if it is given.'''
+    raw = view(table.clocks)
+    if mask is not None:
+        raw = raw[boost_mask(mask)]
+    return BoostDeltas(type=raw['_type'].copy(), freq_delta=raw['_freqDelta'] / 1000.0)
+
+def thermal_sensors(thermal: NV_GPU_THERMAL_EX, count: typing.Optional[int]=None) -> 'np.ndarray':
+    '''Returns sensor temperatures in Celsius, NaN for sensors past `count` (as probed by read_thermal_sensors).'''
+    temps = view(thermal._sensors) / 256.0
+    if count is not None:
+        temps[count:] = np.nan
+    return temps
+
+def power_monitor(status: NV_POWER_MONITOR_STATUS) -> RailReadings:
+    '''Converts readings of channels present in status.channelMask.'''
+    channels = np.flatnonzero((status.channelMask >> np.arange(len(status.entries), dtype=np.uint32)) & 1)
+    raw = view(status.entries)[channels]
+    return RailReadings(channel=channels, power=raw['_powerAvg'] / 1000.0, power_min=raw['_powerMin'] / 1000.0,
+                        power_max=raw['_powerMax'] / 1000.0, current=raw['_current'] / 1000.0,
+                        voltage=raw['_voltage'] / 1000000.0, energy=raw['_energy'].copy())
@@ -0,0 +1,82 @@
+'''Backends resolving nvapi functions for Method-s.'''
+
+import ctypes
+import os
+import sys
+import typing
+import weakref
+
+def _target(arg):
+    '''Returns memory object a pointer-like argument points to, or None if argument is passed by value.'''
+    if isinstance(arg, ctypes._Pointer):
+        return arg.contents
+    if isinstance(arg, ctypes.Array):
+        return arg
+    obj = getattr(arg, '_obj', None)
+    if obj is not None and type(arg).__name__ == 'CArgObject':
+        return obj
+    return None
+
+class Backend:
+    '''Resolves nvapi functions by their QueryInterface offsets.'''
+    def resolve(self, method) -> typing.Optional[typing.Callable]:
+        '''Returns a callable accepting the same arguments as `method` and returning raw NvAPI_Status, or None.'''
+        raise NotImplementedError()
+
+class DllBackend(Backend):
+    '''Real nvapi driver library, loaded on first resolve.'''
+    def __init__(self, path: typing.Optional[str]=None):
+        self.path = path or ('nvapi64.dll' if sys.maxsize > 2**32 else 'nvapi.dll')
+        self.__query = None
+
+    def resolve(self, method) -> typing.Optional[typing.Callable]:
+        if self.__query is None:
+            query = ctypes.CDLL(self.path).nvapi_QueryInterface
+            query.restype = ctypes.c_void_p
+            query.argtypes = [ctypes.c_int]
+            self.__query = query
+        addr = self.__query(method.offset)
+        if not addr:
+            return None
+        return method.proto(addr)
+
+_methods = weakref.WeakSet()
+_backend = None
+
+def _default_backend() -> Backend:
+    replay = os.environ.get('PYNVRAW_REPLAY')
+    if replay:
+        from .record import ReplayBackend
+        return ReplayBackend(replay)
+    simulate = os.environ.get('PYNVRAW_SIMULATE')
+    if simulate:
+        from .simulated import SimulatedBackend
+        backend = SimulatedBackend(int(simulate))
+    else:
+        backend = DllBackend()
+    record = os.environ.get('PYNVRAW_RECORD')
+    if record:
+        from .record import RecordingBackend
+        return RecordingBackend(backend, record)
+    return backend
+
+def track(method):
+    '''Registers a method so it is reset (dropping resolved function and such) when backend changes.'''
+    _methods.add(method)
+
+def get_backend() -> Backend:
+    '''Returns current backend; by default it is DllBackend, or replay/recording one if
+    PYNVRAW_REPLAY/PYNVRAW_RECORD environment variables point to a recording file,
+    or SimulatedBackend with PYNVRAW_SIMULATE=<number of GPUs>.'''
+    global _backend
+    if _backend is None:
+        _backend = _default_backend()
+    return _backend
+
+def set_backend(backend: Backend) -> Backend:
+    '''Switches all nvapi calls to given backend, returns the previous one.'''
+    global _backend
+    previous, _backend = _backend, backend
+    for method in list(_methods):
+        method.reset()
+    return previous
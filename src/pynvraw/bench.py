@@ -0,0 +1,303 @@
+'''Benchmarks of pynvraw overhead over raw driver calls, runnable without a GPU.
+
+    python -m pynvraw.bench [--output results.json] [--compare baseline.json] [--filter nvapi.]
+
+Cases are grouped by name prefix:
+    part.*      building blocks of a call (status mapping, struct construction, decoding)
+    raw.*       bare backend function behind each NvMethod, i.e. the "driver" itself
+    method.*    NvMethod call with prebuilt arguments (raw + status handling)
+    bound.*     NvMethod.bind() callable with byref arguments, the hot path used by Gpu
+    nvapi.*     NvAPI.get_* / read_* methods
+    pool.*      the same getters reusing buffers from a BufferPool
+    gpu.*       Gpu properties and methods
+    fail.*      calls the driver rejects as unsupported, raising NvError vs returning status
+    fleet.*     sweeps over all GPUs with per-call driver latency
+    import.*    fresh interpreter importing pynvraw modules, `import.python` is the bare interpreter baseline
+Micro-benchmarks run against a null backend (every call succeeds doing nothing), so they measure pynvraw itself;
+fleet ones run against simulated GPUs with frozen time and `--latency` seconds per driver call.
+Results are JSON, comparing with a previous run reports cases slower by more than `--threshold`.
+'''
+
+import argparse
+import ctypes
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import typing
+
+from .nvapi_api import NvAPI, NvMethod, NvPhysicalGpu, NV_GPU_THERMAL_EX, NV_GPU_PERF_PSTATES20_INFO, \
+        NV_POWER_MONITOR_INFO, NV_GPU_CLOCKBOOST_TABLE, NV_GPU_VFP_CURVE, PrivateActiveApplicationArray, \
+        NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, NVAPI_GPU_PUBLIC_CLOCK_MEMORY
+from .status import NvStatus, NvError
+from .gpu import Gpu, NUMERIC_READ_FIELDS
+from .capabilities import Capabilities
+from .buffers import BufferPool
+from .simulated import SimulatedBackend, GpuModel
+
+FORMAT_VERSION = 1
+
+class NullBackend(SimulatedBackend):
+    '''Every GPU call succeeds immediately without touching its arguments; only init and enumeration are simulated,
+    and P-states report a bare editable P0 so overclock getters have something to parse.'''
+    _PASSTHROUGH = {'NvAPI_Initialize', 'NvAPI_Unload', 'NvAPI_SYS_GetDriverAndBranchVersion', 'NvAPI_EnumPhysicalGPUs',
+                    'NvAPI_GPU_GetPstates20'}
+
+    def _NvAPI_GPU_GetPstates20(self, handle, value):
+        value.bIsEditable = value.numPstates = 1
+        value.numClocks = 2
+        pstate = value._pstates[0]
+        pstate.bIsEditable = 1
+        for clock, domain in zip(pstate._clocks, (NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, NVAPI_GPU_PUBLIC_CLOCK_MEMORY)):
+            clock._domainId = domain
+            clock.bIsEditable = 1
+        return 0
+
+    def resolve(self, method) -> typing.Optional[typing.Callable]:
+        if method.name in self._PASSTHROUGH:
+            return super().resolve(method)
+        def stub(*args):
+            return 0
+        return stub
+
+class UnsupportedBackend(NullBackend):
+    '''Every GPU call fails with NVAPI_NOT_SUPPORTED.'''
+    _PASSTHROUGH = NullBackend._PASSTHROUGH - {'NvAPI_GPU_GetPstates20'}
+
+    def resolve(self, method) -> typing.Optional[typing.Callable]:
+        if method.name in self._PASSTHROUGH:
+            return super().resolve(method)
+        def stub(*args):
+            return -104
+        return stub
+
+def _frozen_backend(count: int, latency: float=0.0) -> SimulatedBackend:
+    return SimulatedBackend([GpuModel(bus=idx + 1, clock=lambda: 0.0) for idx in range(count)], latency=latency)
+
+def measure(func: typing.Callable, min_time: float=0.1, repeat: int=5) -> typing.Dict[str, float]:
+    '''Times `func` in batches of at least `min_time` seconds, returns median and best ns per call.'''
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+    per_call = [elapsed / number * 1e9] + [t / number * 1e9 for t in timer.repeat(repeat=repeat - 1, number=number)]
+    return {'ns': statistics.median(per_call), 'min_ns': min(per_call), 'calls': number * repeat}
+
+def _default_arg(argtype, handle: NvPhysicalGpu):
+    if argtype is NvPhysicalGpu:
+        return handle
+    if hasattr(argtype, '_type_') and isinstance(argtype._type_, type) and issubclass(argtype, ctypes._Pointer):
+        return ctypes.pointer(argtype._type_())
+    if issubclass(argtype, ctypes.Array):
+        return argtype()
+    return 0
+
+_SKIPPED_METHODS = ('Set', 'Restore', 'Restart', 'Unload', 'Initialize')
+
+def _methods(api: NvAPI) -> typing.Iterator[typing.Tuple[str, NvMethod]]:
+    for name in dir(NvAPI):
+        method = getattr(api, name)
+        if isinstance(method, NvMethod) and not any(part in name for part in _SKIPPED_METHODS):
+            yield name, method
+
+def part_cases(api: NvAPI, handle: NvPhysicalGpu):
+    thermal = NV_GPU_THERMAL_EX()
+    pstates = NV_GPU_PERF_PSTATES20_INFO()
+    yield 'part.NvStatus.by_value', lambda: NvStatus.by_value(0)
+    yield 'part.ctypes.pointer', lambda: ctypes.pointer(pstates)
+    yield 'part.ctypes.byref', lambda: ctypes.byref(pstates)
+    for klass in (NV_GPU_THERMAL_EX, NV_GPU_PERF_PSTATES20_INFO, NV_POWER_MONITOR_INFO, NV_GPU_CLOCKBOOST_TABLE):
+        yield f'part.new.{klass.__name__}', klass
+    yield 'part.new.PrivateActiveApplicationArray', PrivateActiveApplicationArray
+    yield 'part.NV_GPU_THERMAL_EX.sensors', lambda: thermal.sensors
+    monitor = NV_POWER_MONITOR_INFO()
+    monitor.channelMask = 0b1111 # a typical board reports a handful of the 32 channels
+    yield 'part.NV_POWER_MONITOR_INFO.as_dict', monitor.as_dict
+    yield 'part.NV_POWER_MONITOR_INFO.to_dict', monitor.to_dict
+    yield 'part.NV_POWER_MONITOR_INFO.to_json', monitor.to_json
+    yield 'part.NV_POWER_MONITOR_INFO.to_bytes', monitor.to_bytes
+    curve = NV_GPU_VFP_CURVE()
+    yield 'part.NV_GPU_VFP_CURVE.properties', lambda: [(point.frequency, point.voltage) for point in curve.clocks]
+    try:
+        from . import arrays
+        arrays.vfp_curve(curve)
+    except ImportError:
+        return
+    yield 'part.NV_GPU_VFP_CURVE.numpy', lambda: arrays.vfp_curve(curve)
+
+def raw_cases(api: NvAPI, handle: NvPhysicalGpu):
+    for name, method in _methods(api):
+        args = [_default_arg(argtype, handle) for argtype in method.proto._argtypes_]
+        method(*args) # resolves the function
+        func = method.func
+        yield f'raw.{name}', lambda func=func, args=args: func(*args)
+        yield f'method.{name}', lambda method=method, args=args: method(*args)
+        yield f'bound.{name}', method.bind(*(ctypes.byref(arg.contents) if isinstance(arg, ctypes._Pointer) else arg for arg in args))
+
+_GETTER_ARGS = {
+    'get_driver_version': lambda api, handle: (),
+    'get_gpu_by_bus': lambda api, handle: (0, 0), # null backend leaves ids zeroed
+    'get_freqs': lambda api, handle: (handle, 0),
+    'get_power_monitor_status': lambda api, handle: (handle, api.get_power_monitor_info(handle)),
+    'get_boost_table': lambda api, handle: (handle, api.get_boost_mask(handle)),
+    'get_vfp_curve': lambda api, handle: (handle, api.get_boost_mask(handle)),
+}
+
+def nvapi_cases(api: NvAPI, handle: NvPhysicalGpu):
+    for name in dir(api):
+        if not name.startswith(('get_', 'read_')) or not callable(getattr(api, name)):
+            continue
+        args = _GETTER_ARGS.get(name, lambda api, handle: (handle,))(api, handle)
+        method = getattr(api, name)
+        yield f'nvapi.{name}', lambda method=method, args=args: method(*args)
+
+def pool_cases(api: NvAPI, handle: NvPhysicalGpu):
+    pool = BufferPool(api, handle)
+    for name in dir(api):
+        method = getattr(api, name)
+        if not name.startswith('get_') or not callable(method) or 'into' not in inspect.signature(method).parameters:
+            continue
+        args = _GETTER_ARGS.get(name, lambda api, handle: (handle,))(api, handle)[1:]
+        yield f'pool.{name}', lambda name=name, args=args: pool.read(name, *args)
+
+_GPU_PROPERTIES = ('core_temp', 'hotspot_temp', 'vram_temp', 'name', 'fan', 'power_limit', 'power', 'perf_limit',
+                   'ram_type', 'memory_used', 'memory_total', 'memory_available', 'pstate')
+
+def gpu_cases(api: NvAPI, handle: NvPhysicalGpu):
+    gpu = Gpu(handle, api)
+    for name in _GPU_PROPERTIES:
+        yield f'gpu.{name}', lambda name=name: getattr(gpu, name)
+    yield 'gpu.get_freqs', lambda: gpu.get_freqs('current')
+    yield 'gpu.get_overclock', gpu.get_overclock
+    yield 'gpu.get_rail_powers', gpu.get_rail_powers
+    yield 'gpu.read', gpu.read
+    yield 'gpu.read.temps', lambda: gpu.read('core_temp', 'hotspot_temp', 'vram_temp')
+
+def fail_cases(api: NvAPI, handle: NvPhysicalGpu):
+    def raising():
+        try:
+            api.get_power_status(handle)
+        except NvError:
+            pass
+    yield 'fail.raise.get_power_status', raising
+    yield 'fail.try_call_versioned.power_status', \
+            lambda: api.NvAPI_GPU_ClientPowerPoliciesGetStatus.try_call_versioned(handle)
+    # capabilities claiming support, so every read reaches the driver and fails
+    gpu = Gpu(handle, api, Capabilities(thermal_sensors=3, coolers='rtx', memory_info='DisplayDriverMemoryInfoV3',
+                                        unsupported=frozenset()))
+    yield 'fail.gpu.read', lambda: gpu.read(*NUMERIC_READ_FIELDS)
+
+def fleet_cases(api: NvAPI, gpus: typing.Sequence[Gpu]):
+    yield f'fleet.sequential_read.{len(gpus)}gpus', lambda: [gpu.read(*NUMERIC_READ_FIELDS) for gpu in gpus]
+    try:
+        from .fleet import FleetSampler
+        sampler = FleetSampler(gpus)
+    except ImportError:
+        return
+    with sampler:
+        yield f'fleet.sampler.{len(gpus)}gpus', sampler.sample
+
+_IMPORTS = {
+    'import.python': 'pass',
+    'import.pynvraw': 'import pynvraw',
+    'import.pynvraw.gpu': 'import pynvraw.gpu',
+}
+
+def import_cases():
+    env = dict((k, v) for k, v in os.environ.items() if not k.startswith('PYNVRAW_'))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                      env.get('PYTHONPATH')]))
+    for name, code in _IMPORTS.items():
+        yield name, lambda code=code: subprocess.run([sys.executable, '-c', code], env=env, check=True)
+
+def run(filter: str='', gpus: int=8, latency: float=0.0002, min_time: float=0.1, repeat: int=5,
+        log: typing.Optional[typing.TextIO]=sys.stdout) -> typing.Dict[str, typing.Any]:
+    '''Runs benchmark cases with names containing `filter`, returns results in machine-readable form.'''
+    results = {}
+    def bench(cases):
+        for name, func in cases:
+            if filter not in name:
+                continue
+            try:
+                func()
+            except Exception as ex:
+                results[name] = {'error': repr(ex)}
+            else:
+                results[name] = measure(func, min_time=min_time, repeat=repeat)
+            if log:
+                value = results[name]
+                log.write(f'{name:60s} {value["error"] if "error" in value else format(value["ns"], "12.0f") + " ns"}\n')
+
+    # each api is unloaded through its own backend when done, whatever still references it
+    with NvAPI(NullBackend(1)) as api:
+        handle = api.gpu_handles[0]
+        bench(part_cases(api, handle))
+        bench(raw_cases(api, handle))
+        bench(nvapi_cases(api, handle))
+        bench(pool_cases(api, handle))
+        bench(gpu_cases(api, handle))
+
+    with NvAPI(UnsupportedBackend(1)) as api:
+        bench(fail_cases(api, api.gpu_handles[0]))
+
+    with NvAPI(_frozen_backend(gpus, latency=latency)) as api:
+        bench(fleet_cases(api, [Gpu(handle, api) for handle in api.gpu_handles]))
+
+    bench(import_cases())
+
+    return {'format': FORMAT_VERSION, 'timestamp': time.time(), 'python': sys.version.split()[0],
+            'platform': platform.platform(), 'version': _version(), 'gpus': gpus, 'latency': latency, 'results': results}
+
+def _version() -> str:
+    try:
+        from importlib.metadata import version
+        return version('pynvraw')
+    except Exception:
+        return 'unknown'
+
+def compare(current: typing.Dict[str, typing.Any], baseline: typing.Dict[str, typing.Any],
+            threshold: float=0.15) -> typing.List[typing.Tuple[str, float, float]]:
+    '''Returns (name, baseline ns, current ns) of cases which got slower by more than `threshold` (relative).'''
+    regressions = []
+    for name, value in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if not base or 'ns' not in base or 'ns' not in value:
+            continue
+        if value['ns'] > base['ns'] * (1 + threshold):
+            regressions.append((name, base['ns'], value['ns']))
+    return regressions
+
+def main(argv: typing.Optional[typing.Sequence[str]]=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m pynvraw.bench', description='Benchmarks pynvraw without a GPU.')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.15, help='relative slowdown reported as regression')
+    parser.add_argument('--filter', default='', help='only run cases with names containing this')
+    parser.add_argument('--gpus', type=int, default=8, help='number of simulated GPUs for fleet cases')
+    parser.add_argument('--latency', type=float, default=0.0002, help='simulated driver call latency for fleet cases, seconds')
+    parser.add_argument('--quick', action='store_true', help='shorter and noisier measurements')
+    args = parser.parse_args(argv)
+
+    results = run(filter=args.filter, gpus=args.gpus, latency=args.latency,
+                  min_time=0.02 if args.quick else 0.1, repeat=3 if args.quick else 5)
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as out:
+            json.dump(results, out, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare, encoding='utf8') as inp:
+            regressions = compare(results, json.load(inp), args.threshold)
+        for name, base, current in regressions:
+            print(f'REGRESSION {name}: {base:.0f} ns -> {current:.0f} ns ({current / base - 1:+.0%})')
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+'''Per-GPU pool of reusable output buffers for NvAPI getters, so repeated reads allocate no structs.'''
+
+import threading
+import typing
+
+from .nvapi_api import NvAPI, NvPhysicalGpu, PrivateActiveApplicationArray
+
+# getters returning something else than their output buffer -> class of the buffer to preallocate for them
+_PREALLOCATED = {'get_active_apps': PrivateActiveApplicationArray}
+
+class BufferPool:
+    '''Reusable output buffers of one GPU, one per NvAPI getter and thread.
+
+    read('get_pstates') calls api.get_pstates(handle, into=buffer) with the struct returned by previous call
+    from the same thread, so the result stays valid only until that thread reads the same getter again.
+    Buffers are pre-versioned by the first call, which also negotiates struct version with the driver.
+    '''
+    def __init__(self, api: NvAPI, handle: NvPhysicalGpu):
+        self.api = api
+        self.handle = handle
+        self.__local = threading.local()
+
+    def read(self, getter: str, *args, **kw):
+        '''Calls NvAPI method `getter` for this GPU reusing its buffer, returns what it returned.'''
+        buffers = self.__local.__dict__
+        into = buffers.get(getter)
+        klass = _PREALLOCATED.get(getter)
+        if into is None and klass is not None:
+            into = buffers[getter] = klass()
+        value = getattr(self.api, getter)(self.handle, *args, into=into, **kw)
+        if klass is None:
+            buffers[getter] = value
+        return value
+
+    def get(self, getter: str) -> typing.Optional[typing.Any]:
+        '''Returns buffer of the last read of `getter` by current thread, None if there was none.'''
+        return self.__local.__dict__.get(getter)
+
+    def clear(self):
+        '''Drops buffers of current thread.'''
+        self.__local.__dict__.clear()
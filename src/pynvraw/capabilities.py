@@ -0,0 +1,189 @@
+'''Per-GPU capability matrix, probed once per driver version and GPU model and cached on disk.
+
+Gpu uses it to send reads straight to the supported variant (struct version, cooler interface,
+number of thermal sensors) or straight to None, instead of failing calls on every sample.
+The on-disk cache is only used with the real driver (DllBackend); simulated, recorded and replayed
+sessions probe every time so that recordings contain the probing calls.
+'''
+
+import json
+import os
+import sys
+import threading
+import typing
+
+from .nvapi_api import NvAPI, NvPhysicalGpu, NV_COOLER_TARGET
+from .backend import DllBackend
+from .status import NvError, UNSUPPORTED_STATUS_VALUES
+
+FORMAT_VERSION = 1
+
+class Capabilities(typing.NamedTuple):
+    '''What a GPU supports: number of thermal sensors (None if unsupported), cooler interface ("gtx", "rtx" or None),
+    name of the memory info struct accepted by the driver (or None) and names of unsupported calls.'''
+    thermal_sensors: typing.Optional[int]
+    coolers: typing.Optional[str]
+    memory_info: typing.Optional[str]
+    unsupported: typing.FrozenSet[str]
+
+def _is_unsupported(ex: Exception) -> bool:
+    if isinstance(ex, NvError):
+        return int(ex.status) in UNSUPPORTED_STATUS_VALUES
+    # function is missing from the driver library
+    return isinstance(ex, RuntimeError)
+
+def _probe_thermal(api: NvAPI, handle: NvPhysicalGpu) -> typing.Optional[int]:
+    try:
+        count, _ = api.read_thermal_sensors(handle)
+    except NvError as ex:
+        if _is_unsupported(ex):
+            return None
+        raise
+    return count
+
+def _probe_coolers(api: NvAPI, handle: NvPhysicalGpu) -> typing.Optional[str]:
+    try:
+        settings = api.get_cooler_settings(handle, NV_COOLER_TARGET.ALL)
+        if settings.count:
+            return 'gtx'
+    except (NvError, RuntimeError) as ex:
+        if not _is_unsupported(ex):
+            raise
+    try:
+        control = api.get_coolers_control(handle)
+        if control.count:
+            return 'rtx'
+    except ValueError:
+        pass # too old driver
+    except (NvError, RuntimeError) as ex:
+        if not _is_unsupported(ex):
+            raise
+    return None
+
+def _probe_memory_info(api: NvAPI, handle: NvPhysicalGpu) -> typing.Optional[str]:
+    try:
+        return type(api.get_memory_info(handle)).__name__
+    except NvError as ex:
+        if ex.status == 'NVAPI_INCOMPATIBLE_STRUCT_VERSION' or _is_unsupported(ex):
+            return None
+        raise
+
+def _remember_memory_info(api: NvAPI, handle: NvPhysicalGpu, name: typing.Optional[str]):
+    # spares a cached GPU negotiating the struct version again
+    method = api.NvAPI_GPU_GetMemoryInfo
+    if name is None or method.negotiated(handle) is not None:
+        return
+    for klass, version in method.versions:
+        if klass.__name__ == name:
+            method.remember(handle, klass, version)
+            return
+
+def probe(api: NvAPI, handle: NvPhysicalGpu, calls: typing.Mapping[str, typing.Callable[[], typing.Any]]) -> Capabilities:
+    '''Probes what the GPU supports, `calls` maps names of other calls to check to callables making them.'''
+    unsupported = set()
+    for name, call in calls.items():
+        try:
+            call()
+        except (NvError, RuntimeError) as ex:
+            if not _is_unsupported(ex):
+                raise
+            unsupported.add(name)
+    return Capabilities(thermal_sensors=_probe_thermal(api, handle), coolers=_probe_coolers(api, handle),
+                        memory_info=_probe_memory_info(api, handle), unsupported=frozenset(unsupported))
+
+def capability_key(api: NvAPI, handle: NvPhysicalGpu) -> str:
+    '''Returns cache key of the GPU: driver version, branch and PCI identifiers.'''
+    version, branch = api.get_driver_version()
+    ids = api.get_pci_ids(handle)
+    return f'{version}/{branch}/{ids.device_id:08X}-{ids.subsystem_id:08X}-{ids.revision_id:02X}-{ids.ext_device_id:08X}'
+
+def default_cache_path() -> typing.Optional[str]:
+    '''Returns capability cache file under PYNVRAW_CACHE_DIR if it is set (set it empty to disable caching)
+    or under per-user cache directory.'''
+    root = os.environ.get('PYNVRAW_CACHE_DIR')
+    if root is None:
+        if sys.platform == 'win32':
+            base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        else:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        root = os.path.join(base, 'pynvraw')
+    return os.path.join(root, 'capabilities.json') if root else None
+
+class CapabilityCache:
+    '''JSON file of Capabilities by capability_key(), safe to share between processes (writes are atomic).'''
+    def __init__(self, path: str):
+        self.path = path
+        self.__entries = None
+        self.__lock = threading.Lock()
+
+    def __load(self) -> typing.Dict[str, typing.Any]:
+        try:
+            with open(self.path, encoding='utf8') as inp:
+                data = json.load(inp)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('format') != FORMAT_VERSION:
+            return {}
+        return data.get('gpus', {})
+
+    def get(self, key: str) -> typing.Optional[Capabilities]:
+        with self.__lock:
+            if self.__entries is None:
+                self.__entries = self.__load()
+            entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        return Capabilities(thermal_sensors=entry['thermal_sensors'], coolers=entry['coolers'],
+                            memory_info=entry['memory_info'], unsupported=frozenset(entry['unsupported']))
+
+    def put(self, key: str, caps: Capabilities):
+        entry = caps._asdict()
+        entry['unsupported'] = sorted(caps.unsupported)
+        with self.__lock:
+            # merge with entries other processes could have written meanwhile
+            self.__entries = self.__load()
+            self.__entries[key] = entry
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                temp = f'{self.path}.{os.getpid()}.tmp'
+                with open(temp, 'w', encoding='utf8') as out:
+                    json.dump({'format': FORMAT_VERSION, 'gpus': self.__entries}, out, indent=1, sort_keys=True)
+                os.replace(temp, self.path)
+            except OSError:
+                pass # read-only home and such, cache is only an optimization
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_default_cache() -> typing.Optional[CapabilityCache]:
+    '''Returns the cache used for the real driver, None if caching is disabled.'''
+    global _default_cache
+    with _default_lock:
+        path = default_cache_path()
+        if path is None:
+            return None
+        if _default_cache is None or _default_cache.path != path:
+            _default_cache = CapabilityCache(path)
+        return _default_cache
+
+_DEFAULT = object()
+
+def get_capabilities(api: NvAPI, handle: NvPhysicalGpu, calls: typing.Mapping[str, typing.Callable[[], typing.Any]],
+                     cache: typing.Optional[CapabilityCache]=_DEFAULT) -> Capabilities:
+    '''Returns capabilities of the GPU from `cache` (by default the per-user cache if talking to the real driver),
+    probing and storing them there if missing.'''
+    if cache is _DEFAULT:
+        cache = get_default_cache() if type(api.backend) is DllBackend else None
+    try:
+        key = None if cache is None else capability_key(api, handle)
+    except (NvError, RuntimeError):
+        key = None # too old driver to identify the GPU
+    if key is None:
+        return probe(api, handle, calls)
+    caps = cache.get(key)
+    if caps is None:
+        caps = probe(api, handle, calls)
+        cache.put(key, caps)
+    else:
+        _remember_memory_info(api, handle, caps.memory_info)
+    return caps
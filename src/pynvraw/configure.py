@@ -0,0 +1,218 @@
+'''Transactional reconfiguration of a GPU: overclock, power limit and fans in a handful of driver calls.
+
+The current state is read once, only settings which differ are written (core and memory offsets together
+in one Gpu.set_overclock() call), every write is read back and, if any write fails or does not stick,
+the settings already written are restored before the error is raised.
+'''
+
+import typing
+
+from .gpu import Gpu, Clocks, domains
+from .nvapi_api import FAN_COOLER_CONTROL_MODE, NVAPI_COOLER_POLICY_USER, NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, \
+        NVAPI_GPU_PUBLIC_CLOCK_MEMORY
+from .status import NvError
+
+AUTO = 'auto' # fan setting giving control back to the driver
+
+FanSetting = typing.Union[int, typing.Sequence[int], str]
+
+class Change(typing.NamedTuple):
+    setting: str # "core", "memory", "power_limit" or "fan"
+    old: typing.Any
+    new: typing.Any
+
+class ConfigureError(RuntimeError):
+    '''Applying settings failed; `rolled_back` tells whether the GPU was restored to its previous state.'''
+    def __init__(self, msg: str, changes: typing.Sequence[Change], rolled_back: bool,
+                 rollback_errors: typing.Sequence[Exception]=()):
+        super().__init__(msg)
+        self.changes = tuple(changes)
+        self.rolled_back = rolled_back
+        self.rollback_errors = tuple(rollback_errors)
+
+_OVERCLOCK_DOMAINS = {'core': NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, 'memory': NVAPI_GPU_PUBLIC_CLOCK_MEMORY}
+
+class _Transaction:
+    def __init__(self, gpu: Gpu):
+        self.gpu = gpu
+        self.api = gpu.api
+        self.handle = gpu.handle
+        self.undo = []
+
+    # overclock
+
+    def read_overclock(self):
+        self.pstates = self.api.get_pstates(self.handle)
+        if not (self.pstates.numPstates > 0 and self.pstates.pstates[0].bIsEditable):
+            raise ValueError('Overclocking is not available on this GPU')
+        self.clocks = {domains[clock.domainId]: clock for clock in self.pstates.pstates[0].clocks
+                       if clock.domainId in domains}
+
+    def current_offset(self, name: str) -> float:
+        clock = self.clocks.get(name)
+        if clock is None:
+            raise ValueError(f'GPU has no editable {name} clock')
+        return clock.freqDelta_kHz.value / 1000
+
+    def check_offset(self, name: str, value: float):
+        delta = self.clocks[name].freqDelta_kHz
+        if value * 1000 < delta.valueMin or value * 1000 > delta.valueMax:
+            raise ValueError(f'Value for {name} ({value}) is out of range ({delta.valueMin/1000}-{delta.valueMax/1000})')
+
+    def __write_offsets(self, offsets: typing.Dict[str, float]):
+        self.gpu.set_overclock(Clocks(core=offsets.get('core'), memory=offsets.get('memory'), processor=None, video=None))
+
+    def write_overclock(self, changes: typing.Sequence[Change]):
+        old = {change.setting: change.old for change in changes}
+        self.__write_offsets({change.setting: change.new for change in changes})
+        self.undo.append(lambda: self.__write_offsets(old))
+
+    def verify_overclock(self, changes: typing.Sequence[Change]) -> typing.List[str]:
+        states = self.api.get_pstates(self.handle)
+        actual = {domains[clock.domainId]: clock.freqDelta_kHz.value for clock in states.pstates[0].clocks
+                  if clock.domainId in domains}
+        return [f'{change.setting} offset is {actual.get(change.setting, 0) / 1000}MHz instead of {change.new}MHz'
+                for change in changes if actual.get(change.setting) != int(change.new * 1000)]
+
+    # power limit
+
+    def read_power_limit(self) -> typing.Optional[float]:
+        return self.gpu.power_limit
+
+    def __write_power_limit(self, value: float):
+        self.gpu.power_limit = value
+
+    def write_power_limit(self, change: Change):
+        self.__write_power_limit(change.new)
+        self.undo.append(lambda: self.__write_power_limit(change.old))
+
+    def verify_power_limit(self, change: Change) -> typing.List[str]:
+        actual = self.gpu.power_limit
+        if actual is None or abs(actual - change.new) > 0.001:
+            return [f'power limit is {actual}% instead of {change.new}%']
+        return []
+
+    # fans
+
+    def read_fan(self) -> FanSetting:
+        self.coolers = self.gpu.capabilities.coolers
+        if self.coolers == 'rtx':
+            self.control = self.api.get_coolers_control(self.handle)
+            return self.__rtx_setting(self.control)
+        if self.coolers == 'gtx':
+            cooler = self.api.get_cooler_settings(self.handle).coolers[0]
+            return (cooler.current_level,) if cooler.current_policy == NVAPI_COOLER_POLICY_USER else AUTO
+        raise ValueError('GPU has no controllable coolers')
+
+    @staticmethod
+    def __rtx_setting(control) -> FanSetting:
+        entries = control.entries
+        if all(entry.mode != FAN_COOLER_CONTROL_MODE.MANUAL for entry in entries):
+            return AUTO
+        return tuple(entry.level for entry in entries)
+
+    def fan_count(self) -> int:
+        return self.control.count if self.coolers == 'rtx' else 1
+
+    def __write_rtx(self, control):
+        self.api.set_coolers_control(self.handle, control)
+
+    def __write_gtx(self, setting: FanSetting):
+        if setting == AUTO:
+            self.api.restore_coolers(self.handle)
+        else:
+            self.api.set_cooler_duty(self.handle, 0, setting[0])
+
+    def write_fan(self, change: Change):
+        if self.coolers == 'rtx':
+            previous = type(self.control).from_buffer_copy(self.control)
+            for idx, entry in enumerate(self.control.entries):
+                if change.new == AUTO:
+                    entry.mode = FAN_COOLER_CONTROL_MODE.AUTO
+                else:
+                    entry.mode = FAN_COOLER_CONTROL_MODE.MANUAL
+                    entry.level = change.new[idx]
+            self.__write_rtx(self.control)
+            self.undo.append(lambda: self.__write_rtx(previous))
+        else:
+            self.__write_gtx(change.new)
+            self.undo.append(lambda: self.__write_gtx(change.old))
+
+    def verify_fan(self, change: Change) -> typing.List[str]:
+        if self.coolers == 'rtx':
+            actual = self.__rtx_setting(self.api.get_coolers_control(self.handle))
+        else:
+            cooler = self.api.get_cooler_settings(self.handle).coolers[0]
+            actual = (cooler.current_level,) if cooler.current_policy == NVAPI_COOLER_POLICY_USER else AUTO
+        return [] if actual == change.new else [f'fan is {actual} instead of {change.new}']
+
+    def rollback(self) -> typing.List[Exception]:
+        errors = []
+        for undo in reversed(self.undo):
+            try:
+                undo()
+            except Exception as ex: # keep undoing the rest whatever went wrong
+                errors.append(ex)
+        return errors
+
+def _clamp_level(level: int) -> int:
+    return min(max(int(level), 0), 100)
+
+def configure(gpu: Gpu, core: typing.Optional[float]=None, memory: typing.Optional[float]=None,
+              power_limit: typing.Optional[float]=None, fan: typing.Optional[FanSetting]=None,
+              verify: bool=True, dry_run: bool=False) -> typing.List[Change]:
+    '''Applies given settings (None leaves a setting alone) as one transaction, returns what was changed.
+
+    `core` and `memory` are clock offsets in MHz, `power_limit` in %, `fan` is a duty in % for all coolers,
+    a sequence of duties per cooler or AUTO. With `dry_run` nothing is written, only the changes are returned.
+    Raises ValueError for settings out of range before writing anything and ConfigureError if applying failed.'''
+    tx = _Transaction(gpu)
+    changes = []
+    offsets = {name: value for name, value in (('core', core), ('memory', memory)) if value is not None}
+    if offsets:
+        tx.read_overclock()
+        for name, value in offsets.items():
+            old = tx.current_offset(name)
+            tx.check_offset(name, value)
+            if int(value * 1000) != int(old * 1000):
+                changes.append(Change(name, old, value))
+    if power_limit is not None:
+        old = tx.read_power_limit()
+        if old is None:
+            raise ValueError('Cannot read current power limit, refusing to change it without a way to restore it')
+        if abs(old - power_limit) > 0.001:
+            changes.append(Change('power_limit', old, power_limit))
+    if fan is not None:
+        old = tx.read_fan()
+        if fan != AUTO:
+            levels = tuple(fan) if isinstance(fan, (tuple, list)) else (fan,) * tx.fan_count()
+            if len(levels) != tx.fan_count():
+                raise ValueError(f'GPU has {tx.fan_count()} coolers, got {len(levels)} fan levels')
+            fan = tuple(_clamp_level(level) for level in levels)
+        if fan != old:
+            changes.append(Change('fan', old, fan))
+    if dry_run or not changes:
+        return changes
+
+    overclock = [change for change in changes if change.setting in _OVERCLOCK_DOMAINS]
+    others = [change for change in changes if change.setting not in _OVERCLOCK_DOMAINS]
+    problems = []
+    try:
+        if overclock:
+            tx.write_overclock(overclock)
+        for change in others:
+            getattr(tx, f'write_{change.setting}')(change)
+        if verify:
+            if overclock:
+                problems.extend(tx.verify_overclock(overclock))
+            for change in others:
+                problems.extend(getattr(tx, f'verify_{change.setting}')(change))
+    except (NvError, ValueError) as ex:
+        problems.append(str(ex))
+    except Exception as ex: # anything else must not leave the GPU half-configured either
+        problems.append(f'{type(ex).__name__}: {ex}')
+    if not problems:
+        return changes
+    errors = tx.rollback()
+    raise ConfigureError(f'Cannot configure GPU: {"; ".join(problems)}', changes, rolled_back=not errors,
+                         rollback_errors=errors)
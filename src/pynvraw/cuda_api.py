@@ -1,37 +1,51 @@
-'''Module for working with CUDA API.'''
+'''Module for working with CUDA API, the driver library is loaded and initialized on first use.'''
 
 import ctypes
+import threading
 import typing
 
-cuda = ctypes.CDLL('nvcuda.dll')
-
 CU_DEVICE_ATTRIBUTE_PCI_BUS_ID = 33
 CU_DEVICE_ATTRIBUTE_PCI_DEVICE_ID = 34
 
-cuInit = cuda.cuInit
-cuInit.restype = ctypes.c_int
-cuInit.argtypes = [ctypes.c_int]
-
-cuDeviceGetAttribute = cuda.cuDeviceGetAttribute
-cuDeviceGetAttribute.restype = ctypes.c_int
-cuDeviceGetAttribute.argtypes = [ctypes.POINTER(ctypes.c_int), ctypes.c_int, ctypes.c_int]
-
-def _init_cuda():
-    res = cuInit(0)
-    if res != 0:
-        raise RuntimeError(f'Cannot initialize CUDA: {res}', res)
+_cuda = None
+_cuda_lock = threading.Lock()
+
+def _get_cuda() -> ctypes.CDLL:
+    '''Loads nvcuda.dll and calls cuInit once.'''
+    global _cuda
+    if _cuda is None:
+        with _cuda_lock:
+            if _cuda is None:
+                cuda = ctypes.CDLL('nvcuda.dll')
+                cuda.cuInit.restype = ctypes.c_int
+                cuda.cuInit.argtypes = [ctypes.c_int]
+                cuda.cuDeviceGetAttribute.restype = ctypes.c_int
+                cuda.cuDeviceGetAttribute.argtypes = [ctypes.POINTER(ctypes.c_int), ctypes.c_int, ctypes.c_int]
+                cuda.cuDeviceGetCount.restype = ctypes.c_int
+                cuda.cuDeviceGetCount.argtypes = [ctypes.POINTER(ctypes.c_int)]
+                res = cuda.cuInit(0)
+                if res != 0:
+                    raise RuntimeError(f'Cannot initialize CUDA: {res}', res)
+                _cuda = cuda
+    return _cuda
 
 def _get_cuda_attr(dev: int, attr: int) -> int:
     value = ctypes.c_int(-1)
-    res = cuDeviceGetAttribute(ctypes.pointer(value), attr, dev)
+    res = _get_cuda().cuDeviceGetAttribute(ctypes.pointer(value), attr, dev)
     if res != 0:
         raise ValueError(f'Can not get CUDA attribute {attr}: {res}', res)
     return value.value
 
+def get_cuda_device_count() -> int:
+    '''Returns number of CUDA devices.'''
+    value = ctypes.c_int(0)
+    res = _get_cuda().cuDeviceGetCount(ctypes.pointer(value))
+    if res != 0:
+        raise ValueError(f'Can not get CUDA device count: {res}', res)
+    return value.value
+
 def get_cuda_bus_slot(dev: int) -> typing.Tuple[int, int]:
     '''Reads bus id and slot id for given CUDA device.'''
     busId = _get_cuda_attr(dev, CU_DEVICE_ATTRIBUTE_PCI_BUS_ID)
     slotId = _get_cuda_attr(dev, CU_DEVICE_ATTRIBUTE_PCI_DEVICE_ID)
     return busId, slotId
-
-_init_cuda()
@@ -0,0 +1,142 @@
+'''Exact per-rail energy accounting from the power monitor's cumulative energy counters.
+
+Each power monitor channel has a 64-bit counter of consumed energy (millijoules), so energy over an interval
+is the difference of two reads regardless of how power fluctuated in between, no high-rate polling needed.
+A counter going backwards is either a wraparound (from near its maximum to near zero) or a driver reset
+(e.g. after a driver restart or GPU reset), in which case energy since the reset is counted and the
+interval is reported as a lower bound. Calling EnergyMeter.update() now and then during long intervals
+bounds what a reset can lose to the time since the previous update.
+'''
+
+import threading
+import time
+import typing
+
+from .gpu import Gpu
+from .nvapi_api import PowerChannelType, PowerRailType, NV_POWER_MONITOR_INFO
+
+COUNTER_BITS = 64
+_JOULES_PER_UNIT = 0.001
+
+class EnergySample(typing.NamedTuple):
+    timestamp: float # time.time() of the read
+    counters: typing.Tuple[int] # raw counter of each power monitor channel, None if not reported
+    clock: float # time.monotonic() of the read, intervals are measured by it
+
+class EnergyReport(typing.NamedTuple):
+    seconds: float # monotonic, unaffected by wall clock adjustments
+    gpu: float # Joules used by the whole GPU (its total power channel), None if it has no such channel
+    rails: typing.Dict[PowerRailType, float] # Joules per rail, summed over channels of each rail
+    channels: typing.Dict[int, float] # Joules per channel index
+    resets: int # counter resets seen, if non-zero the values are lower bounds
+
+    @property
+    def gpu_watts(self) -> typing.Optional[float]:
+        '''Average GPU power over the interval.'''
+        if self.gpu is None or self.seconds <= 0:
+            return None
+        return self.gpu / self.seconds
+
+def counter_delta(start: int, end: int, bits: int=COUNTER_BITS) -> typing.Tuple[int, bool]:
+    '''Returns counter increase from `start` to `end` and whether the counter was reset in between.'''
+    if end >= start:
+        return end - start, False
+    limit = 1 << bits
+    quarter = limit >> 2
+    if start >= limit - quarter and end < quarter:
+        return end + limit - start, False
+    # restarted from zero, only what was counted since then is known
+    return end, True
+
+class EnergyMeter:
+    '''Accumulates energy of every power monitor channel of a GPU.
+
+        with EnergyMeter(gpu) as meter:
+            run_job()
+        print(meter.report.gpu, 'J')
+    '''
+    def __init__(self, gpu: Gpu, bits: int=COUNTER_BITS):
+        self.gpu = gpu
+        self.bits = bits
+        self.report = None
+        self.__info = None
+        self.__start = None
+        self.__last = None
+        self.__totals = None
+        self.__resets = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def info(self) -> NV_POWER_MONITOR_INFO:
+        if self.__info is None:
+            self.__info = self.gpu.api.get_power_monitor_info(self.gpu.handle)
+        return self.__info
+
+    def sample(self) -> EnergySample:
+        '''Reads energy counters of all channels.'''
+        info = self.info
+        status = self.gpu.buffers.read('get_power_monitor_status', info)
+        mask = status.channelMask
+        counters = tuple(entry._energy if mask & (1 << idx) else None for idx, entry in enumerate(status.entries))
+        return EnergySample(timestamp=time.time(), counters=counters, clock=time.monotonic())
+
+    def between(self, start: EnergySample, end: EnergySample) -> EnergyReport:
+        '''Computes energy used between two samples.'''
+        channels = {}
+        resets = 0
+        for idx, (first, last) in enumerate(zip(start.counters, end.counters)):
+            if first is None or last is None:
+                continue
+            delta, reset = counter_delta(first, last, self.bits)
+            channels[idx] = delta * _JOULES_PER_UNIT
+            resets += reset
+        return self.__report(end.clock - start.clock, channels, resets)
+
+    def __report(self, seconds: float, channels: typing.Dict[int, float], resets: int) -> EnergyReport:
+        info = self.info
+        rails = {}
+        for idx, joules in channels.items():
+            channel = info.channels[idx]
+            if channel.type == PowerChannelType.DEFAULT:
+                continue
+            rails[channel.rail] = rails.get(channel.rail, 0.0) + joules
+        total = info.totalGpuChannelIndex
+        gpu = channels.get(total) if info.totalGpuPowerChannelMask >> total & 1 else None
+        return EnergyReport(seconds=seconds, gpu=gpu, rails=rails, channels=channels, resets=resets)
+
+    def start(self):
+        '''Starts accumulating from now on, dropping what was accumulated before.'''
+        sample = self.sample()
+        with self.__lock:
+            self.__start = self.__last = sample
+            self.__totals = {}
+            self.__resets = 0
+            self.report = None
+
+    def update(self) -> EnergyReport:
+        '''Adds energy used since previous update (or start), returns totals since start.'''
+        sample = self.sample()
+        with self.__lock:
+            if self.__start is None:
+                raise RuntimeError('EnergyMeter is not started')
+            step = self.between(self.__last, sample)
+            for idx, joules in step.channels.items():
+                self.__totals[idx] = self.__totals.get(idx, 0.0) + joules
+            self.__resets += step.resets
+            self.__last = sample
+            self.report = self.__report(sample.clock - self.__start.clock, dict(self.__totals), self.__resets)
+            return self.report
+
+    def stop(self) -> EnergyReport:
+        '''Makes the final update, returns totals since start and keeps them in `report`.'''
+        report = self.update()
+        with self.__lock:
+            self.__start = None
+        return report
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,65 @@
+'''Parallel sampling of many GPUs into a GPUs x metrics NumPy matrix.'''
+
+import concurrent.futures
+import typing
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .gpu import Gpu, NUMERIC_READ_FIELDS, _as_float
+
+class FleetSampler:
+    '''Reads the same metrics from every GPU at once, one pool thread per GPU.
+
+    ctypes releases the GIL while in the driver, so a sweep costs about as much as the slowest GPU.
+    Unsupported metrics and GPUs which failed to read are reported as NaN.
+    '''
+    def __init__(self, gpus: typing.Optional[typing.Sequence[Gpu]]=None, fields: typing.Sequence[str]=NUMERIC_READ_FIELDS,
+                 max_workers: typing.Optional[int]=None):
+        if np is None:
+            raise ImportError('FleetSampler requires numpy to be installed')
+        if gpus is None:
+            from . import get_gpus
+            gpus = get_gpus()
+        self.gpus = tuple(gpus)
+        self.fields = tuple(fields)
+        bad = [name for name in self.fields if name not in NUMERIC_READ_FIELDS]
+        if bad:
+            raise ValueError(f'Non-numeric or unknown fields: {", ".join(bad)}')
+        self.matrix = np.full((len(self.gpus), len(self.fields)), np.nan, dtype=np.float64)
+        self.errors = {}
+        self.__pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or max(len(self.gpus), 1),
+                                                            thread_name_prefix='pynvraw-fleet')
+
+    def __fill_row(self, out, row: int, gpu: Gpu):
+        try:
+            out[row, :] = [_as_float(value) for value in gpu.read(*self.fields)]
+        except Exception as ex: # one bad GPU must not abort the whole sweep
+            out[row, :] = np.nan
+            return ex
+        return None
+
+    def sample(self, out: typing.Optional['np.ndarray']=None) -> 'np.ndarray':
+        '''Reads all GPUs into `out` (own preallocated matrix by default, overwritten on each call) and returns it.'''
+        if out is None:
+            out = self.matrix
+        elif out.shape != self.matrix.shape:
+            raise ValueError(f'Expected matrix of shape {self.matrix.shape}, got {out.shape}')
+        futures = [self.__pool.submit(self.__fill_row, out, row, gpu) for row, gpu in enumerate(self.gpus)]
+        self.errors = {}
+        for row, future in enumerate(futures):
+            error = future.result()
+            if error is not None:
+                self.errors[row] = error
+        return out
+
+    def close(self):
+        self.__pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,12 +1,18 @@
 import collections
 import ctypes
+import math
+import threading
+import time
 import typing
 
 from .nvapi_api import NvAPI, NvPhysicalGpu, NV_GPU_THERMAL_SETTINGS, NVAPI_THERMAL_TARGET_ALL, NVAPI_THERMAL_TARGET_GPU, \
         NvAPI_ShortString, NV_GPU_CLOCK_FREQUENCIES_CURRENT_FREQ, NV_GPU_CLOCK_FREQUENCIES_BASE_CLOCK, NV_GPU_CLOCK_FREQUENCIES_BOOST_CLOCK, \
         NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, NVAPI_GPU_PUBLIC_CLOCK_MEMORY, NVAPI_GPU_PUBLIC_CLOCK_PROCESSOR, NVAPI_GPU_PUBLIC_CLOCK_VIDEO, \
-        NV_GPU_POWER_STATUS, FAN_COOLER_CONTROL_MODE, PerfCapReason, PerformanceStateId, RamType, PowerRailType, PowerChannelType
-from .status import NvError
+        NV_GPU_POWER_STATUS, FAN_COOLER_CONTROL_MODE, PerfCapReason, PerformanceStateId, RamType, PowerRailType, PowerChannelType, \
+        UtilizationDomain, NV_GPU_THERMAL_EX, NV_GPU_CLOCK_FREQUENCIES, NV_COOLER_TARGET
+from .status import UNSUPPORTED_STATUS_VALUES
+from .capabilities import Capabilities, get_capabilities
+from .buffers import BufferPool
 
 class Delta(typing.NamedTuple):
     current: float
@@ -30,27 +36,233 @@ class PowerDetails(typing.NamedTuple):
     current: float
     voltage: float
 
+class GpuReading:
+    '''Immutable snapshot of GPU metrics taken by Gpu.read().'''
+    __slots__ = ('fields', 'timestamp', 'core_temp', 'hotspot_temp', 'vram_temp', 'fan', 'core_clock', 'memory_clock',
+                 'processor_clock', 'video_clock', 'power_limit', 'power', 'perf_limit', 'pstate', 'core_voltage',
+                 'memory_used', 'memory_total', 'memory_available', 'gpu_utilization', 'fb_utilization',
+                 'video_utilization', 'bus_utilization', 'ram_type', 'name')
+
+    def __init__(self, fields: typing.Tuple[str], values: typing.Sequence, timestamp: float):
+        setattr_ = super().__setattr__
+        setattr_('fields', fields)
+        setattr_('timestamp', timestamp)
+        for name, value in zip(fields, values):
+            setattr_(name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{self.__class__.__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{self.__class__.__name__} is immutable')
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __eq__(self, o: object) -> bool:
+        if not isinstance(o, GpuReading):
+            return NotImplemented
+        return self.fields == o.fields and tuple(self) == tuple(o)
+
+    def __hash__(self):
+        return hash((self.fields, tuple(self)))
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        return collections.OrderedDict((name, getattr(self, name)) for name in self.fields)
+
+    def __repr__(self) -> str:
+        values = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.fields)
+        return f'{self.__class__.__name__}({values})'
+
+def _max_or_none(values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+def _utilization(domain):
+    return lambda info: info.utilization[domain].percent if info.utilization[domain].present else None
+
+# field name -> (source method of Gpu, extractor from what that source returned)
+_READ_FIELDS = collections.OrderedDict([
+    ('core_temp', ('_read_sensors', lambda temps: temps[0])),
+    ('hotspot_temp', ('_read_sensors', lambda temps: temps[1])),
+    ('vram_temp', ('_read_sensors', lambda temps: _max_or_none(temps[8:10]))),
+    ('fan', ('_read_fan', lambda levels: levels)),
+    ('core_clock', ('_read_current_freqs', lambda clocks: clocks.core)),
+    ('memory_clock', ('_read_current_freqs', lambda clocks: clocks.memory)),
+    ('processor_clock', ('_read_current_freqs', lambda clocks: clocks.processor)),
+    ('video_clock', ('_read_current_freqs', lambda clocks: clocks.video)),
+    ('power_limit', ('_read_power_status', lambda status: max(e.power for e in status.entries[:status.count]) / 1000 if status.count else None)),
+    ('power', ('_read_topology', lambda status: next((e.power for e in status.entries[:status.count] if e.domain == 0), None))),
+    ('perf_limit', ('_read_perf_limit', lambda limit: limit)),
+    ('pstate', ('_read_pstate', lambda pstate: pstate)),
+    ('core_voltage', ('_read_voltage', lambda voltage: voltage)),
+    ('memory_used', ('_read_memory', lambda info: info.availableDedicatedVideoMemory - info.currentAvailableDedicatedVideoMemory)),
+    ('memory_total', ('_read_memory', lambda info: info.availableDedicatedVideoMemory)),
+    ('memory_available', ('_read_memory', lambda info: info.currentAvailableDedicatedVideoMemory)),
+    ('gpu_utilization', ('_read_utilization', _utilization(UtilizationDomain.GPU))),
+    ('fb_utilization', ('_read_utilization', _utilization(UtilizationDomain.FrameBuffer))),
+    ('video_utilization', ('_read_utilization', _utilization(UtilizationDomain.VideoEngine))),
+    ('bus_utilization', ('_read_utilization', _utilization(UtilizationDomain.BusInterface))),
+    ('ram_type', ('_read_ram_type', lambda ram: ram)),
+    ('name', ('_read_name', lambda name: name)),
+])
+READ_FIELDS = tuple(_READ_FIELDS)
+NUMERIC_READ_FIELDS = tuple(name for name in READ_FIELDS if name != 'name')
+
+def _as_float(value) -> float:
+    if value is None:
+        return math.nan
+    if isinstance(value, (tuple, list)):
+        # multi-cooler fans and such are reduced to their maximum
+        return float(max(value)) if value else math.nan
+    return float(value)
+
+class _ReadPlan(typing.NamedTuple):
+    fields: typing.Tuple[str]
+    sources: typing.Tuple[str]
+    steps: typing.Tuple[typing.Tuple[int, typing.Callable]]
+
+def _make_read_plan(fields: typing.Tuple[str]) -> _ReadPlan:
+    unknown = [name for name in fields if name not in _READ_FIELDS]
+    if unknown:
+        raise ValueError(f'Unknown fields to read: {", ".join(unknown)}')
+    sources = []
+    steps = []
+    for name in fields:
+        source, extract = _READ_FIELDS[name]
+        if source not in sources:
+            sources.append(source)
+        steps.append((sources.index(source), extract))
+    return _ReadPlan(fields=fields, sources=tuple(sources), steps=tuple(steps))
+
+def _current_freqs(value: NV_GPU_CLOCK_FREQUENCIES):
+    value.ClockType = NV_GPU_CLOCK_FREQUENCIES_CURRENT_FREQ
+
+def _thermal_mask(count: int):
+    def prepare(value: NV_GPU_THERMAL_EX):
+        value.mask = (1 << count) - 1
+    return prepare
+
+# hot-path call -> (NvAPI method, factory of output buffer taking the Gpu and new_struct(prepare=None) making
+# a struct of the version negotiated for the method[, arguments passed before the buffer]), see Gpu._call_bound
+_BOUND_CALLS = {
+    'thermal': ('NvAPI_GPU_QueryThermalSensors', lambda gpu, new: new(_thermal_mask(gpu.capabilities.thermal_sensors))),
+    'freqs': ('NvAPI_GPU_GetAllClockFrequencies', lambda gpu, new: new(_current_freqs)),
+    'power_status': ('NvAPI_GPU_ClientPowerPoliciesGetStatus', lambda gpu, new: new()),
+    'topology': ('NvAPI_GPU_ClientPowerTopologyGetStatus', lambda gpu, new: new()),
+    'perf_status': ('NvAPI_GPU_PerfPoliciesGetStatus', lambda gpu, new: new()),
+    'pstate': ('NvAPI_GPU_GetCurrentPstate', lambda gpu, new: ctypes.c_int()),
+    'voltage': ('NvAPI_GPU_GetCurrentVoltage', lambda gpu, new: new()),
+    'memory': ('NvAPI_GPU_GetMemoryInfo', lambda gpu, new: new()),
+    'utilization': ('NvAPI_GPU_GetDynamicPstatesInfoEx', lambda gpu, new: new()),
+    'ram_type': ('NvAPI_GPU_GetRamType', lambda gpu, new: ctypes.c_uint32()),
+    'gtx_coolers': ('NvAPI_GPU_GetCoolerSettings', lambda gpu, new: new(), (int(NV_COOLER_TARGET.ALL),)),
+    'rtx_coolers': ('NvAPI_GPU_ClientFanCoolersGetControl', lambda gpu, new: new()),
+}
+# calls which support is described by dedicated Capabilities fields
+_PROBED_SEPARATELY = {'thermal', 'memory', 'gtx_coolers', 'rtx_coolers'}
+
+def _unsupported_call():
+    return 0
+
 domains = {NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS: 'core', NVAPI_GPU_PUBLIC_CLOCK_MEMORY: 'memory',
            NVAPI_GPU_PUBLIC_CLOCK_PROCESSOR: 'processor', NVAPI_GPU_PUBLIC_CLOCK_VIDEO: 'video'}
 
 class Gpu:
     '''Wrapper over low-level NvPhysicalGpu structure.'''
-    def __init__(self, handle: NvPhysicalGpu, api: NvAPI):
+    def __init__(self, handle: NvPhysicalGpu, api: NvAPI, capabilities: typing.Optional[Capabilities]=None):
         self.handle = handle
         self.api = api
         self.__name = None
-        self.__sensor_hint = None
+        self.__caps = capabilities
         self.__power_info = None
         self.__cooler_type = None
+        self.__read_plans = {}
+        self.__bound = threading.local()
+        self.__buffers = None
+        self.__residency = None
+
+    @property
+    def capabilities(self) -> Capabilities:
+        '''What this GPU supports, probed on first use or taken from the on-disk cache.'''
+        if self.__caps is None:
+            calls = {key: lambda key=key: self.__probe_bound(key) for key in _BOUND_CALLS if key not in _PROBED_SEPARATELY}
+            self.__caps = get_capabilities(self.api, self.handle, calls)
+        return self.__caps
+
+    @property
+    def buffers(self) -> BufferPool:
+        '''Reusable output buffers for NvAPI getters of this GPU.'''
+        if self.__buffers is None:
+            self.__buffers = BufferPool(self.api, self.handle)
+        return self.__buffers
+
+    @property
+    def residency(self) -> 'ResidencyTracker':
+        '''P-state and clock residency tracker of this GPU, feed it by residency.sample() or a Sampler.'''
+        if self.__residency is None:
+            from .residency import ResidencyTracker
+            self.__residency = ResidencyTracker(self)
+        return self.__residency
+
+    def __make_bound(self, key: str):
+        method, factory, *args = _BOUND_CALLS[key]
+        args = args[0] if args else ()
+        method = getattr(self.api, method)
+        value = factory(self, lambda prepare=None: method.new_struct(self.handle, *args, prepare=prepare))
+        return method.bind(self.handle, *args, ctypes.byref(value), check=False), value
+
+    def __probe_bound(self, key: str):
+        status = self.__make_bound(key)[0]()
+        if status:
+            getattr(self.api, _BOUND_CALLS[key][0]).check(status)
+
+    def __supports(self, key: str) -> bool:
+        caps = self.capabilities
+        if key == 'thermal':
+            return caps.thermal_sensors is not None
+        if key == 'memory':
+            return caps.memory_info is not None
+        if key in ('gtx_coolers', 'rtx_coolers'):
+            return caps.coolers == key[:3]
+        return key not in caps.unsupported
+
+    def __bind(self, key: str):
+        bound = self.__make_bound(key) if self.__supports(key) else (_unsupported_call, None)
+        setattr(self.__bound, key, bound)
+        return bound
+
+    def __failed(self, key: str, status: int):
+        if status in UNSUPPORTED_STATUS_VALUES:
+            return None
+        getattr(self.api, _BOUND_CALLS[key][0]).check(status)
+
+    def _call_bound(self, key: str):
+        '''Makes a hot-path nvapi call prebound to this GPU, returns its output buffer which is reused by next calls
+        or None if the GPU does not support it (without calling the driver if known from capabilities).
+        Buffers are per-thread, so they stay valid until the same thread makes the same call again.'''
+        call, value = getattr(self.__bound, key, None) or self.__bind(key)
+        status = call()
+        if status:
+            return self.__failed(key, status)
+        return value
+
+    def _read_sensors(self):
+        thermal = self._call_bound('thermal')
+        if thermal is None:
+            return None
+        sensors, count = thermal.sensors, self.__caps.thermal_sensors
+        return sensors[:count] + (None,) * (len(sensors) - count)
 
     def _get_temp(self, *indices):
-        try:
-            self.__sensor_hint, sensors = self.api.read_thermal_sensors(self.handle, self.__sensor_hint)
-        except NvError as ex:
-            if ex.status == 'NVAPI_NOT_SUPPORTED':
-                return None
-            raise
-        return tuple(sensors[idx] if idx < self.__sensor_hint else None for idx in indices)
+        thermal = self._call_bound('thermal')
+        if thermal is None:
+            return (None,) * len(indices)
+        raw, count = thermal._sensors, self.__caps.thermal_sensors
+        return tuple(raw[idx] / 256.0 if idx < count else None for idx in indices)
 
     @property
     def core_temp(self) -> typing.Union[float, None]:
@@ -78,12 +290,9 @@ class Gpu:
         return self.__name
 
     def __read_gtx_coolers(self):
-        try:
-            settings = self.api.get_cooler_settings(self.handle)
-        except NvError as ex:
-            if ex.status == 'NVAPI_NOT_SUPPORTED':
-                return None
-            raise
+        settings = self._call_bound('gtx_coolers')
+        if settings is None:
+            return None
         return tuple(cooler.current_level for cooler in settings.coolers[:settings.count])
 
     def __write_gtx_coolers(self, levels):
@@ -92,12 +301,9 @@ class Gpu:
         self.api.set_cooler_duty(self.handle, 0, value)
 
     def __read_rtx_coolers(self):
-        try:
-            control = self.api.get_coolers_control(self.handle)
-        except NvError as ex:
-            if ex.status == 'NVAPI_NOT_SUPPORTED':
-                return None
-            raise
+        control = self._call_bound('rtx_coolers')
+        if control is None:
+            return None
         return tuple(cooler.level for cooler in control.entries)
 
     def __write_rtx_coolers(self, levels):
@@ -110,16 +316,13 @@ class Gpu:
 
     def __get_cooler_interface(self):
         if self.__cooler_type is None:
-            gtx = self.__read_gtx_coolers()
-            if gtx:
-                assert len(gtx) == 1
-                self.__cooler_type = (self.__read_gtx_coolers, self.__write_gtx_coolers, len(gtx))
+            coolers = self.capabilities.coolers
+            if coolers == 'gtx':
+                self.__cooler_type = (self.__read_gtx_coolers, self.__write_gtx_coolers, 1)
+            elif coolers == 'rtx':
+                self.__cooler_type = (self.__read_rtx_coolers, self.__write_rtx_coolers, len(self.__read_rtx_coolers() or ()))
             else:
-                rtx = self.__read_rtx_coolers()
-                if rtx:
-                    self.__cooler_type = (self.__read_rtx_coolers, self.__write_rtx_coolers, len(rtx))
-                else:
-                    self.__cooler_type = (lambda: (), lambda levels: None, 0)
+                self.__cooler_type = (lambda: (), lambda levels: None, 0)
         return self.__cooler_type
 
     @property
@@ -142,27 +345,36 @@ class Gpu:
             return freqs.domain[clock_id].frequency / 1000
         return None
 
+    @classmethod
+    def __cast_clocks(cls, value) -> Clocks:
+        return Clocks(core=cls.__cast_domain_freq(value, NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS), 
+                      memory=cls.__cast_domain_freq(value, NVAPI_GPU_PUBLIC_CLOCK_MEMORY),
+                      processor=cls.__cast_domain_freq(value, NVAPI_GPU_PUBLIC_CLOCK_PROCESSOR), 
+                      video=cls.__cast_domain_freq(value, NVAPI_GPU_PUBLIC_CLOCK_VIDEO))
+
     def get_freqs(self, clock_type_str: str) -> Clocks:
         '''Reads clocks for given clock type: "current", "base" or "boost".'''
         clock_type = {
                 'current': NV_GPU_CLOCK_FREQUENCIES_CURRENT_FREQ,
                 'base': NV_GPU_CLOCK_FREQUENCIES_BASE_CLOCK,
                 'boost': NV_GPU_CLOCK_FREQUENCIES_BOOST_CLOCK}[clock_type_str.lower()]
-        value = self.api.get_freqs(self.handle, clock_type)
+        if clock_type == NV_GPU_CLOCK_FREQUENCIES_CURRENT_FREQ:
+            value = self._call_bound('freqs')
+            if value is None:
+                return Clocks(core=None, memory=None, processor=None, video=None)
+        else:
+            value = self.buffers.read('get_freqs', clock_type)
         known = {NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, NVAPI_GPU_PUBLIC_CLOCK_MEMORY, NVAPI_GPU_PUBLIC_CLOCK_PROCESSOR, NVAPI_GPU_PUBLIC_CLOCK_VIDEO}
         for i in range(len(value.domain)):
             if i in known:
                 continue
             if value.domain[i].bIsPresent != 0:
                 print(f'Unknown domain #{i} present, freq={value.domain[i].frequency / 1000}')
-        return Clocks(core=self.__cast_domain_freq(value, NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS), 
-                      memory=self.__cast_domain_freq(value, NVAPI_GPU_PUBLIC_CLOCK_MEMORY),
-                      processor=self.__cast_domain_freq(value, NVAPI_GPU_PUBLIC_CLOCK_PROCESSOR), 
-                      video=self.__cast_domain_freq(value, NVAPI_GPU_PUBLIC_CLOCK_VIDEO))
+        return self.__cast_clocks(value)
 
     def get_overclock(self) -> ClockDelta:
         '''Reads current overclocking settings (current delta and minimum-maximum pair for each clock).'''
-        states = self.api.get_pstates(self.handle)
+        states = self.buffers.read('get_pstates')
         assert states.numPstates > 0 and states.pstates[0].bIsEditable
         p0 = states.pstates[0]
         result = ClockDelta(None, None, None, None)
@@ -197,8 +409,8 @@ class Gpu:
     @property
     def power_limit(self) -> float:
         '''Reads current power limit in %.'''
-        status = self.api.get_power_status(self.handle)
-        if status.count == 0:
+        status = self._call_bound('power_status')
+        if status is None or status.count == 0:
             return None
         return max(e.power for e in status.entries[:status.count]) / 1000
 
@@ -213,7 +425,9 @@ class Gpu:
     @property
     def power(self) -> float:
         '''Reads current power consumption in %.'''
-        status = self.api.get_topology_status(self.handle)
+        status = self._call_bound('topology')
+        if status is None:
+            return None
         for entry in status.entries[:status.count]:
             if entry.domain == 0: # GPU consumption
                 return entry.power
@@ -223,7 +437,7 @@ class Gpu:
         '''Reads power/current/voltage usings of different rails in the GPU.'''
         if self.__power_info is None:
             self.__power_info = self.api.get_power_monitor_info(self.handle)
-        raw = self.api.get_power_monitor_status(self.handle, self.__power_info)
+        raw = self.buffers.read('get_power_monitor_status', self.__power_info)
         result = collections.defaultdict(list)
         for channel, status in zip(self.__power_info.channels, raw.entries):
             if channel.type == PowerChannelType.DEFAULT:
@@ -234,12 +448,26 @@ class Gpu:
     @property
     def perf_limit(self) -> PerfCapReason:
         '''Reads current performance cap reasons.'''
-        return self.api.get_performance_limit(self.handle)
+        status = self._call_bound('perf_status')
+        return None if status is None else status.limit
+
+    def get_vf_curve(self) -> 'VfCurve':
+        '''Loads the voltage-frequency curve for editing, see VfCurve.'''
+        from .vfcurve import VfCurve
+        return VfCurve.load(self)
+
+    def configure(self, core: float=None, memory: float=None, power_limit: float=None, fan=None,
+                  verify: bool=True, dry_run: bool=False) -> typing.List['Change']:
+        '''Applies clock offsets (MHz), power limit (%) and fan duty (%, per-cooler sequence or "auto")
+        as one transaction rolled back on failure, see configure.configure(). Returns settings changed.'''
+        from .configure import configure
+        return configure(self, core=core, memory=memory, power_limit=power_limit, fan=fan,
+                         verify=verify, dry_run=dry_run)
 
     def _show_boost_table(self):
-        mask = self.api.get_boost_mask(self.handle)
-        curve = self.api.get_vfp_curve(self.handle, mask)
-        table = self.api.get_boost_table(self.handle, mask)
+        mask = self.buffers.read('get_boost_mask')
+        curve = self.buffers.read('get_vfp_curve', mask)
+        table = self.buffers.read('get_boost_table', mask)
 
         for idx, (maskClock, curveClock, tableClock) in enumerate(zip(mask.clocks, curve.clocks, table.clocks)):
             if not maskClock.enabled:
@@ -249,26 +477,79 @@ class Gpu:
     @property
     def ram_type(self) -> RamType:
         '''Returns RAM type of the GPU.'''
-        return self.api.get_ram_type(self.handle)
+        value = self._call_bound('ram_type')
+        return None if value is None else RamType(value.value)
 
     @property
     def memory_used(self) -> float:
         '''Returns MB of dedicated memory currently occupied.'''
-        info = self.api.get_memory_info(self.handle)
+        info = self._call_bound('memory')
+        if info is None:
+            return None
         return info.availableDedicatedVideoMemory - info.currentAvailableDedicatedVideoMemory
 
     @property
     def memory_total(self) -> float:
         '''Returns MB of dedicated memory installed on the card.'''
-        info = self.api.get_memory_info(self.handle)
-        return info.availableDedicatedVideoMemory
+        info = self._call_bound('memory')
+        return None if info is None else info.availableDedicatedVideoMemory
 
     @property
     def memory_available(self) -> float:
         '''Returns MB of free dedicated memory.'''
-        info = self.api.get_memory_info(self.handle)
-        return info.currentAvailableDedicatedVideoMemory
+        info = self._call_bound('memory')
+        return None if info is None else info.currentAvailableDedicatedVideoMemory
 
     @property
     def pstate(self) -> PerformanceStateId:
-        return self.api.get_current_pstate(self.handle)
+        value = self._call_bound('pstate')
+        return None if value is None else PerformanceStateId(value.value)
+
+    def _read_fan(self):
+        return self.fan
+
+    def _read_current_freqs(self):
+        value = self._call_bound('freqs')
+        return None if value is None else self.__cast_clocks(value)
+
+    def _read_power_status(self):
+        return self._call_bound('power_status')
+
+    def _read_topology(self):
+        return self._call_bound('topology')
+
+    def _read_perf_limit(self):
+        return self.perf_limit
+
+    def _read_pstate(self):
+        return self.pstate
+
+    def _read_voltage(self):
+        value = self._call_bound('voltage')
+        return None if value is None else value.voltage
+
+    def _read_memory(self):
+        return self._call_bound('memory')
+
+    def _read_utilization(self):
+        return self._call_bound('utilization')
+
+    def _read_ram_type(self):
+        return self.ram_type
+
+    def _read_name(self):
+        return self.name
+
+    def read(self, *fields: str) -> GpuReading:
+        '''Reads given fields (all of READ_FIELDS if none given) calling each underlying nvapi method only once.'''
+        fields = fields or READ_FIELDS
+        plan = self.__read_plans.get(fields)
+        if plan is None:
+            plan = self.__read_plans[fields] = _make_read_plan(fields)
+        timestamp = time.time()
+        raw = [getattr(self, source)() for source in plan.sources]
+        values = []
+        for idx, extract in plan.steps:
+            data = raw[idx]
+            values.append(None if data is None else extract(data))
+        return GpuReading(plan.fields, values, timestamp)
@@ -1,18 +1,14 @@
 '''Low-level API working through obscure nvapi.dll.'''
 
+import copy
 import ctypes
 import typing
-import sys
 import collections
 import enum
+import operator
 
 from .status import NvStatus, NvError, NVAPI_OK
-
-nvapi = ctypes.CDLL('nvapi64.dll' if sys.maxsize > 2**32 else 'nvapi.dll')
-
-_nvapi_QueryInterface = nvapi.nvapi_QueryInterface
-_nvapi_QueryInterface.restype = ctypes.c_void_p
-_nvapi_QueryInterface.argtypes = [ctypes.c_int]
+from .backend import Backend, get_backend, track
 
 NVAPI_MAX_PHYSICAL_GPUS = 64
 NVAPI_MAX_THERMAL_SENSORS_PER_GPU = 3
@@ -46,6 +42,156 @@ NVAPI_MAX_NUMBER_OF_APPLICATIONS = 128
 NvAPI_ShortString = ctypes.c_char * NVAPI_SHORT_STRING_MAX
 NvAPI_LongString = ctypes.c_char * NVAPI_LONG_STRING_MAX
 
+# class -> names shown by StrMixin.as_dict() and friends, in order
+_field_plans = {}
+
+def _field_plan(klass: type) -> typing.Tuple[str]:
+    plan = _field_plans.get(klass)
+    if plan is not None:
+        return plan
+    shown = []
+    for base in reversed(klass.__mro__):
+        for fld in getattr(base, '_fields_', []):
+            name = fld[0]
+            if name.startswith('reserved'):
+                continue
+            if name.startswith('_') and hasattr(klass, name[1:]):
+                name = name[1:]
+            if name not in shown:
+                shown.append(name)
+        for name, value in base.__dict__.items():
+            if isinstance(value, property) and name not in shown:
+                shown.append(name)
+    plan = _field_plans[klass] = tuple(shown)
+    return plan
+
+def _plain_passthrough(value):
+    return value
+
+def _plain_bytes(value: bytes) -> str:
+    return value.decode('utf8', 'replace')
+
+def _plain_enum(value: enum.Enum):
+    return value.name if value.name is not None else value.value
+
+def _plain_mixin(value: 'StrMixin'):
+    return value.to_dict()
+
+def _plain_sequence(value) -> list:
+    return [_plain(e) for e in value]
+
+def _plain_mapping(value) -> dict:
+    return {(k.name if isinstance(k, enum.Enum) else k): _plain(v) for k, v in value.items()}
+
+def _plain_simple(value: ctypes._SimpleCData):
+    return _plain(value.value)
+
+def _plain_mixins(value) -> list:
+    return [e.to_dict() for e in value]
+
+# ctypes codes of simple types read from struct fields as int, float or bool
+_NUMERIC_CODES = frozenset('bBhHiIlLqQfdg?')
+
+def _field_converter(ctype: type) -> typing.Callable:
+    '''Returns converter to plain form of what reading a struct field of given ctypes type gives.'''
+    if issubclass(ctype, ctypes._SimpleCData):
+        return _plain_passthrough if ctype._type_ in _NUMERIC_CODES else _plain
+    if issubclass(ctype, StrMixin):
+        return _plain_mixin
+    if issubclass(ctype, ctypes.Array):
+        item = ctype._type_
+        if item is ctypes.c_char:
+            return _plain_bytes
+        if issubclass(item, ctypes._SimpleCData) and item._type_ in _NUMERIC_CODES:
+            return list
+        if issubclass(item, StrMixin):
+            return _plain_mixins
+    return _plain
+
+def _mask_value(value) -> int:
+    if isinstance(value, ctypes.Array):
+        return sum(word << (32 * idx) for idx, word in enumerate(value))
+    return value
+
+def _masked_step(name: str, mask: str, convert: typing.Callable) -> typing.Callable:
+    def step(obj):
+        bits = _mask_value(getattr(obj, mask))
+        items = getattr(obj, name)
+        return {idx: convert(items[idx]) for idx in range(len(items)) if bits >> idx & 1}
+    return step
+
+def _counted_step(name: str, count: str, convert: typing.Callable) -> typing.Callable:
+    return lambda obj: [convert(e) for e in getattr(obj, name)[:getattr(obj, count)]]
+
+def _property_step(fget: typing.Callable) -> typing.Callable:
+    # properties return values of any type, so converters are looked up by the type of each value
+    def step(obj, converters=_plain_converters):
+        value = fget(obj)
+        convert = converters.get(type(value))
+        return _plain(value) if convert is None else convert(value)
+    return step
+
+# class -> ((name, step converting that field of a struct to plain form), ...) used by StrMixin.to_dict()
+_dict_plans = {}
+
+def _dict_plan(klass: type) -> typing.Tuple[typing.Tuple[str, typing.Callable]]:
+    plan = _dict_plans.get(klass)
+    if plan is not None:
+        return plan
+    ctypes_of = {}
+    for base in klass.__mro__:
+        for fld in getattr(base, '_fields_', []):
+            ctypes_of.setdefault(fld[0], fld[1])
+    masks = getattr(klass, '_dict_masks_', {})
+    counts = getattr(klass, '_dict_counts_', {})
+    plan = []
+    for name in _field_plan(klass):
+        attr = getattr(klass, name, None)
+        if isinstance(attr, property):
+            getter, convert = attr.fget, None
+        else:
+            getter, convert = operator.attrgetter(name), _field_converter(ctypes_of[name])
+        if name in masks or name in counts:
+            item = _field_converter(ctypes_of[name]._type_)
+            if name in masks:
+                step = _masked_step(name, masks[name], item)
+            else:
+                step = _counted_step(name, counts[name], item)
+        elif convert is None:
+            step = _property_step(getter)
+        elif convert is _plain_passthrough:
+            step = getter
+        else:
+            step = lambda obj, getter=getter, convert=convert: convert(getter(obj))
+        plan.append((name, step))
+    plan = _dict_plans[klass] = tuple(plan)
+    return plan
+
+# type of a value -> its converter to JSON-compatible form, filled on first sight of each type
+_plain_converters = {int: _plain_passthrough, float: _plain_passthrough, str: _plain_passthrough,
+                     bool: _plain_passthrough, type(None): _plain_passthrough, bytes: _plain_bytes}
+
+def _plain(value):
+    kind = type(value)
+    convert = _plain_converters.get(kind)
+    if convert is None:
+        if issubclass(kind, enum.Enum):
+            convert = _plain_enum
+        elif issubclass(kind, StrMixin):
+            convert = _plain_mixin
+        elif issubclass(kind, (ctypes.Array, list, tuple)):
+            convert = _plain_sequence
+        elif issubclass(kind, dict):
+            convert = _plain_mapping
+        elif issubclass(kind, ctypes._SimpleCData):
+            convert = _plain_simple
+        elif issubclass(kind, (int, float)):
+            convert = _plain_passthrough
+        else:
+            convert = str
+        _plain_converters[kind] = convert
+    return convert(value)
+
 class StrMixin:
     def __str__(self):
         dct = self.as_dict()
@@ -72,22 +218,7 @@ class StrMixin:
         return str(obj)
     def as_dict(self):
         result = collections.OrderedDict(__name__=self.__class__.__name__)
-        shown = []
-        for base in reversed(self.__class__.__mro__):
-            fields = getattr(base, '_fields_', [])
-            for fld in fields:
-                name = fld[0]
-                if name.startswith('reserved'):
-                    continue
-                if name.startswith('_') and hasattr(self, name[1:]):
-                    name = name[1:]
-                if name not in shown:
-                    shown.append(name)
-            for name, value in base.__dict__.items():
-                if isinstance(value, property) and name not in shown:
-                    shown.append(name)
-            
-        for name in shown:
+        for name in _field_plan(self.__class__):
             value = getattr(self, name)
             if value is None:
                 continue
@@ -100,6 +231,27 @@ class StrMixin:
                     value = [self._cast(e) for e in value]
             result[name] = value
         return result
+    # array field -> field with the count of its valid entries, or with the bitmask of them, for to_dict()
+    _dict_counts_ = {}
+    _dict_masks_ = {}
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        '''Returns fields and properties as plain JSON-compatible values (enums by name, nested structs as dicts).
+        Arrays limited by a count hold only valid entries, those limited by a mask are {index: entry} of set bits.'''
+        plan = _dict_plans.get(self.__class__) or _dict_plan(self.__class__)
+        return {name: step(self) for name, step in plan}
+    def to_json(self, **kw) -> str:
+        '''Returns to_dict() as JSON, `kw` are passed to json.dumps().'''
+        import json
+        return json.dumps(self.to_dict(), **kw)
+    def to_bytes(self) -> bytes:
+        '''Returns raw memory of the struct, see from_bytes().'''
+        return bytes(self)
+    @classmethod
+    def from_bytes(cls, data: typing.Union[bytes, bytearray, memoryview]):
+        '''Makes a struct from a copy of what to_bytes() returned.'''
+        if len(data) != ctypes.sizeof(cls):
+            raise ValueError(f'{cls.__name__} takes {ctypes.sizeof(cls)} bytes, got {len(data)}')
+        return cls.from_buffer_copy(data)
 
 class StrStructure(StrMixin, ctypes.Structure):
     pass
@@ -113,9 +265,28 @@ class NvPhysicalGpu(ctypes.Structure):
                 ('pad', ctypes.c_int8)]
 NV_ENUM_GPUS = NvPhysicalGpu * NVAPI_MAX_PHYSICAL_GPUS
 
+# (class, version) -> bytes of a freshly initialized struct, or array type -> bytes of its initialized elements
+_templates = {}
+
 class NvVersioned(StrStructure):
-    def __init__(self):
-        self.version = ctypes.sizeof(self) + (self._nv_version_ << 16)
+    # struct versions with this layout drivers may accept, newest first; empty means only _nv_version_
+    _nv_versions_ = ()
+
+    def __init__(self, nv_version: typing.Optional[int]=None):
+        self.version = ctypes.sizeof(self) + ((self._nv_version_ if nv_version is None else nv_version) << 16)
+
+    @classmethod
+    def nv_versions(cls) -> typing.Tuple[int]:
+        return cls._nv_versions_ or (cls._nv_version_,)
+
+    @classmethod
+    def template(cls, nv_version: typing.Optional[int]=None) -> bytes:
+        '''Returns bytes of a new struct of given version, built once per class and version (see array_template()).'''
+        key = cls, nv_version
+        template = _templates.get(key)
+        if template is None:
+            template = _templates[key] = bytes(cls(nv_version))
+        return template
 
 class NV_THERMAL_SENSOR(StrStructure):
     _fields_ = [('controller', ctypes.c_int),
@@ -126,6 +297,8 @@ class NV_THERMAL_SENSOR(StrStructure):
 
 class NV_GPU_THERMAL_SETTINGS(NvVersioned):
     _nv_version_ = 2
+    _dict_counts_ = {'sensor': 'count'}
+    _nv_versions_ = (2, 1)
     _fields_ = [('version', ctypes.c_uint32),
                 ('count', ctypes.c_uint32),
                 ('sensor', NV_THERMAL_SENSOR * NVAPI_MAX_THERMAL_SENSORS_PER_GPU)]
@@ -177,6 +350,7 @@ class NV_GPU_COOLER_SETTINGS(NvVersioned):
             return NV_COOLER_TARGET(self._target)
 
     _nv_version_ = 2
+    _dict_counts_ = {'coolers': 'count'}
     _fields_ = [('version', ctypes.c_uint32),
                 ('count', ctypes.c_uint32),
                 ('coolers', NV_SINGLE_COOLER * 20)]
@@ -635,6 +809,7 @@ class NV_POWER_MONITOR_INFO(NvVersioned):
             return None
 
     _nv_version_ = 3
+    _dict_masks_ = {'channels': 'channelMask', 'relations': 'channelRelationMask'}
     #_pack_ = 4
     _fields_ = [('version', ctypes.c_uint32),
                 ('isSupported', ctypes.c_bool),
@@ -676,6 +851,7 @@ class NV_POWER_MONITOR_STATUS(NvVersioned):
             return self._voltage / 1000000.0
 
     _nv_version_ = 1
+    _dict_masks_ = {'entries': 'channelMask'}
     # check: version == 0x1059C
     _fields_ = [('version', ctypes.c_uint32),
                 ('channelMask', ctypes.c_uint32),
@@ -707,6 +883,7 @@ class NV_GPU_CLOCKBOOST_MASK(NvVersioned):
             return NV_GPU_PUBLIC_CLOCK_ID(self._type)
 
     _nv_version_ = 1
+    _dict_masks_ = {'clocks': 'masks'}
     _pack_ = 8
     _fields_ = [('version', ctypes.c_uint32),
                 ('masks', ctypes.c_uint32 * 16),
@@ -726,6 +903,7 @@ class NV_GPU_CLOCKBOOST_TABLE(NvVersioned):
             return NV_GPU_PUBLIC_CLOCK_ID(self._type)
 
     _nv_version_ = 1
+    _dict_masks_ = {'clocks': 'masks'}
     _pack_ = 8
     _fields_ = [('version', ctypes.c_uint32),
                 ('masks', ctypes.c_uint32 * 16),
@@ -748,6 +926,7 @@ class NV_GPU_VFP_CURVE(NvVersioned):
             return NV_GPU_PUBLIC_CLOCK_ID(self._type)
 
     _nv_version_ = 1
+    _dict_masks_ = {'clocks': 'masks'}
     _fields_ = [('version', ctypes.c_uint32),
                 ('masks', ctypes.c_uint32 * 16),
                 ('clocks', NV_GPU_VFP_CURVE_CLOCK * 255)]
@@ -770,12 +949,18 @@ class NV_GPU_PERFORMANCE_STATUS(NvVersioned):
                 ('unknown2', ctypes.c_uint32 * 3),
                 ('_timers', ctypes.c_ulonglong * 3),
                 ('unknown3', ctypes.c_uint32 * 326)]
+    # order of _timers, each is cumulative time spent capped by that reason in ns
+    TIMER_REASONS = ('POWER', 'TEMPERATURE', 'VOLTAGE')
     @property
     def timer(self):
         return self._timer / 1e9
     @property
     def limit(self):
         return PerfCapReason(self._limit)
+    @property
+    def timers(self):
+        '''Returns seconds spent capped by each of TIMER_REASONS.'''
+        return tuple(t / 1e9 for t in self._timers)
 
 class RamType(enum.IntEnum):
     Unknown = 0
@@ -894,38 +1079,181 @@ class PrivateActiveApplicationV2(NvVersioned):
     def name(self):
         return self._name.decode('utf8')
 
+def array_template(array_type: typing.Type[ctypes.Array]) -> bytes:
+    '''Returns bytes of an array of NvVersioned structs with every element initialized, built once per array type.'''
+    template = _templates.get(array_type)
+    if template is None:
+        template = _templates[array_type] = array_type._type_.template() * array_type._length_
+    return template
+
 class PrivateActiveApplicationArray(PrivateActiveApplicationV2 * NVAPI_MAX_NUMBER_OF_APPLICATIONS):
     def __init__(self):
-        super().__init__()
-        for app in self:
-            app.__init__()
+        ctypes.memmove(self, array_template(type(self)), ctypes.sizeof(self))
+
+NVAPI_INCOMPATIBLE_STRUCT_VERSION = -9
+
+class PciIdentifiers(typing.NamedTuple):
+    device_id: int
+    subsystem_id: int
+    revision_id: int
+    ext_device_id: int
 
 class Method:
     def __init__(self, offset, restype, *argtypes):
-        self.proto = ctypes.CFUNCTYPE(restype, *argtypes, use_errno=True, use_last_error=True)
+        self.proto = ctypes.CFUNCTYPE(restype, *argtypes)
         self.offset = offset
         self.func = None
+        self.backend = None # resolves through the current global backend if None
+        track(self)
 
-    def __call__(self, *args):
+    def reset(self):
+        '''Forgets everything learned from the current backend.'''
+        self.func = None
+
+    def for_backend(self, backend: Backend) -> 'Method':
+        '''Returns a copy of this method always resolved through `backend`, unaffected by set_backend().'''
+        clone = copy.copy(self)
+        clone.backend = backend
+        clone.func = None
+        return clone
+
+    def resolve(self) -> typing.Callable:
         if self.func is None:
-            addr = _nvapi_QueryInterface(self.offset)
-            if addr == 0:
+            func = (get_backend() if self.backend is None else self.backend).resolve(self)
+            if func is None:
                 raise RuntimeError(f'Cannot get nvapi function by offset {self.offset}')
-            self.func = self.proto(addr)
-        return self.func(*args)
+            self.func = func
+        return self.func
+
+    def __call__(self, *args):
+        func = self.func
+        if func is None:
+            func = self.resolve()
+        return func(*args)
 
 class NvMethod(Method):
-    def __init__(self, offset, name, *argtypes, allowed_returns=()):
+    def __init__(self, offset, name, *argtypes, allowed_returns=(), versions=()):
+        '''`versions` are NvVersioned classes the last argument can be passed as, newest first,
+        by default it is the class that argument points to (if it is NvVersioned).'''
         super().__init__(offset, ctypes.c_int, *argtypes)
         self.name = name
         self.allowed_returns = set(NvStatus.cast(x) for x in allowed_returns) | set([NVAPI_OK])
-
-    def __call__(self, *args):
-        result = NvStatus.by_value(super().__call__(*args))
+        if not versions and argtypes:
+            pointee = getattr(argtypes[-1], '_type_', None)
+            if isinstance(pointee, type) and issubclass(pointee, NvVersioned):
+                versions = (pointee,)
+        self.versions = tuple((klass, version) for klass in versions for version in klass.nv_versions())
+        self.__negotiated = {}
+
+    def reset(self):
+        super().reset()
+        self.__negotiated.clear()
+
+    def for_backend(self, backend: Backend) -> 'NvMethod':
+        clone = super().for_backend(backend)
+        clone.__negotiated = {}
+        return clone
+
+    def check(self, status: int) -> NvStatus:
+        result = NvStatus.by_value(status)
         if result in self.allowed_returns:
             return result
         raise NvError(f'Error in {self.name}: {result}', result)
 
+    def __call__(self, *args):
+        return self.check(super().__call__(*args))
+
+    def try_call(self, *args) -> int:
+        '''Makes the call returning raw status value instead of raising NvError.'''
+        return super().__call__(*args)
+
+    def bind(self, *args, check: bool=True) -> typing.Callable[[], typing.Optional[int]]:
+        '''Returns a callable repeating this call with given arguments (pass outputs as ctypes.byref() of reused buffers),
+        costing little more than the foreign call itself as status is only looked up on failure.
+        With `check` false the callable returns raw status value instead of raising NvError.'''
+        if not check:
+            def call():
+                func = self.func
+                if func is None:
+                    func = self.resolve()
+                return func(*args)
+            return call
+        def call():
+            func = self.func
+            if func is None:
+                func = self.resolve()
+            status = func(*args)
+            if status:
+                self.check(status)
+        return call
+
+    def negotiated(self, dev: 'NvPhysicalGpu') -> typing.Optional[typing.Tuple[type, int]]:
+        '''Returns (struct class, version) the driver accepted for this GPU, None if not negotiated yet.'''
+        return self.__negotiated.get(bytes(dev))
+
+    def remember(self, dev: 'NvPhysicalGpu', klass: type, version: int):
+        '''Records (struct class, version) as accepted for this GPU, e.g. known from a previous process,
+        so the next call uses it directly instead of negotiating.'''
+        if (klass, version) not in self.versions:
+            raise ValueError(f'{klass.__name__} version {version} is not a candidate of {self.name}')
+        self.__negotiated[bytes(dev)] = klass, version
+
+    @staticmethod
+    def __make(klass: type, version: int, into: typing.Optional[NvVersioned]) -> NvVersioned:
+        if type(into) is klass:
+            # the driver overwrites outputs, so only the version word is restamped instead of zeroing everything
+            into.version = ctypes.sizeof(klass) + (version << 16)
+            return into
+        return klass(version)
+
+    def try_call_versioned(self, dev: 'NvPhysicalGpu', *args, prepare: typing.Optional[typing.Callable]=None,
+                           into: typing.Optional[NvVersioned]=None) -> typing.Tuple[int, NvVersioned]:
+        '''Calls with a new struct of the version accepted for this GPU appended to arguments,
+        returns raw status value and the struct (filled only if status is NVAPI_OK) without raising NvError.
+        On first call candidate versions are tried newest first until one is accepted, then it is remembered.
+        `prepare(value)` fills input fields of the struct before the call.
+        `into` is a struct from a previous call to reuse instead of allocating if it is of the accepted class,
+        it is not cleared so fields the driver does not write keep their previous values.'''
+        key = bytes(dev)
+        negotiated = self.__negotiated.get(key)
+        if negotiated is not None:
+            value = self.__make(negotiated[0], negotiated[1], into)
+            if prepare is not None:
+                prepare(value)
+            return self.try_call(dev, *args, ctypes.byref(value)), value
+        if not self.versions:
+            raise ValueError(f'{self.name} has no versioned struct argument')
+        for klass, version in self.versions:
+            value = self.__make(klass, version, into)
+            if prepare is not None:
+                prepare(value)
+            status = self.try_call(dev, *args, ctypes.byref(value))
+            if status != NVAPI_INCOMPATIBLE_STRUCT_VERSION:
+                if not status:
+                    self.__negotiated[key] = klass, version
+                break
+        return status, value
+
+    def call_versioned(self, dev: 'NvPhysicalGpu', *args, prepare: typing.Optional[typing.Callable]=None,
+                       into: typing.Optional[NvVersioned]=None) -> NvVersioned:
+        '''Same as try_call_versioned() but raises NvError on failure and returns only the struct.'''
+        status, value = self.try_call_versioned(dev, *args, prepare=prepare, into=into)
+        if status:
+            self.check(status)
+        return value
+
+    def new_struct(self, dev: 'NvPhysicalGpu', *args, prepare: typing.Optional[typing.Callable]=None) -> NvVersioned:
+        '''Returns a new struct of the version accepted for this GPU, negotiating it by a call if needed.
+        If negotiation fails the struct is of the last version tried, so the failure repeats when it is used.'''
+        negotiated = self.__negotiated.get(bytes(dev))
+        if negotiated is None:
+            _, value = self.try_call_versioned(dev, *args, prepare=prepare)
+            negotiated = self.__negotiated.get(bytes(dev)) or (type(value), value.version >> 16)
+        value = negotiated[0](negotiated[1])
+        if prepare is not None:
+            prepare(value)
+        return value
+
 
 class NvAPI:
     NvAPI_Initialize = NvMethod(0x0150E828, 'NvAPI_Initialize')
@@ -937,6 +1265,7 @@ class NvAPI:
     NvAPI_GPU_GetBusSlotId = NvMethod(0x2A0A350F, 'NvAPI_GPU_GetBusSlotId', NvPhysicalGpu, ctypes.POINTER(ctypes.c_uint32))
     NvAPI_GPU_GetThermalSettings = NvMethod(0xE3640A56, 'NvAPI_GPU_GetThermalSettings', NvPhysicalGpu, ctypes.c_uint32, ctypes.POINTER(NV_GPU_THERMAL_SETTINGS))
     NvAPI_GPU_QueryThermalSensors  = NvMethod(0x65FE3AAD, 'NvAPI_GPU_QueryThermalSensors ', NvPhysicalGpu, ctypes.POINTER(NV_GPU_THERMAL_EX))
+    NvAPI_GPU_GetPCIIdentifiers = NvMethod(0x2DDFB66E, 'NvAPI_GPU_GetPCIIdentifiers', NvPhysicalGpu, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32))
     NvAPI_GPU_GetFullName = NvMethod(0xCEEE8E9F, 'NvAPI_GPU_GetFullName', NvPhysicalGpu, ctypes.POINTER(NvAPI_ShortString))
     NvAPI_GPU_SetCoolerLevels = NvMethod(0x891FA0AE, 'NvAPI_GPU_SetCoolerLevels', NvPhysicalGpu, ctypes.c_int32, ctypes.POINTER(NvCoolerLevels))
     NvAPI_GPU_GetCoolerSettings = NvMethod(0xDA141340, 'NvAPI_GPU_GetCoolerSettings', NvPhysicalGpu, ctypes.c_int32, ctypes.POINTER(NV_GPU_COOLER_SETTINGS))
@@ -968,7 +1297,8 @@ class NvAPI:
     NvAPI_RestartDisplayDriver = NvMethod(0xB4B26B65, 'NvAPI_RestartDisplayDriver')
 
     NvAPI_GPU_GetRamType = NvMethod(0x57F7CAAC, 'NvAPI_GPU_GetRamType', NvPhysicalGpu, ctypes.POINTER(ctypes.c_uint32))
-    NvAPI_GPU_GetMemoryInfo = NvMethod(0x7F9B368, 'NvAPI_GPU_GetMemoryInfo', NvPhysicalGpu, ctypes.POINTER(DisplayDriverMemoryInfoV1))
+    NvAPI_GPU_GetMemoryInfo = NvMethod(0x7F9B368, 'NvAPI_GPU_GetMemoryInfo', NvPhysicalGpu, ctypes.POINTER(DisplayDriverMemoryInfoV1),
+                                       versions=(DisplayDriverMemoryInfoV3, DisplayDriverMemoryInfoV2, DisplayDriverMemoryInfoV1))
 
     NvAPI_GPU_GetClockBoostLock = NvMethod(0xE440B867, 'NvAPI_GPU_GetClockBoostLock', NvPhysicalGpu, ctypes.POINTER(PrivateClockBoostLockV2))
     NvAPI_GPU_GetCurrentPstate = NvMethod(0x927DA4F6, 'NvAPI_GPU_GetCurrentPstate', NvPhysicalGpu, ctypes.POINTER(ctypes.c_int))
@@ -976,9 +1306,21 @@ class NvAPI:
 
     NvAPI_GPU_QueryActiveApps = NvMethod(0x65B1C5F5, 'NvAPI_GPU_QueryActiveApps', NvPhysicalGpu, PrivateActiveApplicationArray, ctypes.POINTER(ctypes.c_uint32))
 
-    def __init__(self):
+    def __init__(self, backend: typing.Optional[Backend]=None):
+        '''Initializes nvapi. Calls of an instance given a `backend` always go to that backend,
+        otherwise they go to the global one (see set_backend()), following its switches.'''
+        self.__initialized = False
+        self.__backend = backend
+        if backend is not None:
+            klass = type(self)
+            for name in dir(klass):
+                method = getattr(klass, name)
+                if isinstance(method, Method):
+                    setattr(self, name, method.for_backend(backend))
         self.NvAPI_Initialize()
+        self.__initialized = True
         self.__gpus = None
+        self.__bus_index = None
 
         version = ctypes.c_uint32(0)
         branch = NvAPI_ShortString()
@@ -989,8 +1331,25 @@ class NvAPI:
 
         assert self.__version > 0x4650, f'Too old NVidia drivers (version={self.__version}, branch={self.__branch}): unsupported'
 
+    @property
+    def backend(self) -> Backend:
+        '''Backend calls of this instance go to.'''
+        return get_backend() if self.__backend is None else self.__backend
+
+    def close(self):
+        '''Unloads nvapi; the instance is unusable afterwards. Called on garbage collection if not called before.'''
+        if getattr(self, '_NvAPI__initialized', False):
+            self.__initialized = False
+            self.NvAPI_Unload()
+
     def __del__(self):
-        self.NvAPI_Unload()
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def get_driver_version(self) -> typing.Tuple[int, str]:
         '''Returns driver version as int and branch as str.'''
@@ -1006,31 +1365,47 @@ class NvAPI:
         return self.__gpus
 
 
+    def get_bus_slot(self, dev: NvPhysicalGpu) -> typing.Tuple[int, int]:
+        '''Returns PCI bus id and slot id of the GPU.'''
+        devBusId = ctypes.c_uint32(0)
+        devSlotId = ctypes.c_uint32(0)
+        self.NvAPI_GPU_GetBusId(dev, ctypes.pointer(devBusId))
+        self.NvAPI_GPU_GetBusSlotId(dev, ctypes.pointer(devSlotId))
+        return devBusId.value, devSlotId.value
+
+    @property
+    def bus_index(self) -> typing.Dict[typing.Tuple[int, int], NvPhysicalGpu]:
+        '''Maps (bus id, slot id) to GPU handles, built once.'''
+        if self.__bus_index is None:
+            self.__bus_index = {self.get_bus_slot(gpu): gpu for gpu in self.gpu_handles}
+        return self.__bus_index
+
     def get_gpu_by_bus(self, busId: int, slotId: int) -> NvPhysicalGpu:
-        for gpu in self.gpu_handles:
-            devBusId = ctypes.c_uint32(0)
-            devSlotId = ctypes.c_uint32(0)
-            self.NvAPI_GPU_GetBusId(gpu, ctypes.pointer(devBusId))
-            self.NvAPI_GPU_GetBusSlotId(gpu, ctypes.pointer(devSlotId))
+        try:
+            return self.bus_index[busId, slotId]
+        except KeyError:
+            raise ValueError(f'Cannot find a GPU with bus={busId} and slot={slotId}') from None
 
-            if devBusId.value == busId and devSlotId.value == slotId:
-                return gpu
-        raise ValueError(f'Cannot find a GPU with bus={busId} and slot={slotId}')    
+    def get_pci_ids(self, dev: NvPhysicalGpu) -> PciIdentifiers:
+        '''Returns PCI identifiers, device_id has vendor id in its low 16 bits.'''
+        values = [ctypes.c_uint32(0) for _ in PciIdentifiers._fields]
+        self.NvAPI_GPU_GetPCIIdentifiers(dev, *(ctypes.pointer(v) for v in values))
+        return PciIdentifiers(*(v.value for v in values))
+
+    def get_thermal_settings(self, dev: NvPhysicalGpu, sensor: int=NVAPI_THERMAL_TARGET_ALL,
+                             into: typing.Optional[NV_GPU_THERMAL_SETTINGS]=None) -> NV_GPU_THERMAL_SETTINGS:
+        return self.NvAPI_GPU_GetThermalSettings.call_versioned(dev, sensor, into=into)
 
     def read_thermal_sensors(self, dev: NvPhysicalGpu, sensor_hint=None) -> typing.Tuple[int, typing.Tuple[float]]:
-        exc = None
         counts = [sensor_hint] if sensor_hint is not None else range(32, 1, -1)
         for count in counts:
-            thermal = NV_GPU_THERMAL_EX()
-            thermal.mask = (1 << count) - 1
-            try:
-                self.NvAPI_GPU_QueryThermalSensors(dev, ctypes.pointer(thermal))
-            except NvError as ex:
-                exc = ex
-                continue
-            break
+            def prepare(value):
+                value.mask = (1 << count) - 1
+            status, thermal = self.NvAPI_GPU_QueryThermalSensors.try_call_versioned(dev, prepare=prepare)
+            if not status:
+                break
         else:
-            raise exc
+            self.NvAPI_GPU_QueryThermalSensors.check(status)
         return count, thermal.sensors
 
     def set_cooler_duty(self, dev: NvPhysicalGpu, cooler: int, duty: int):
@@ -1041,71 +1416,53 @@ class NvAPI:
             levels.levels[i].policy = NVAPI_COOLER_POLICY_USER
         self.NvAPI_GPU_SetCoolerLevels(dev, cooler, ctypes.pointer(levels))
 
-    def get_cooler_settings(self, dev: NvPhysicalGpu, cooler: NV_COOLER_TARGET=NV_COOLER_TARGET.ALL) -> NV_GPU_COOLER_SETTINGS:
-        value = NV_GPU_COOLER_SETTINGS()
-        self.NvAPI_GPU_GetCoolerSettings(dev, int(cooler), ctypes.pointer(value))
-        return value
+    def get_cooler_settings(self, dev: NvPhysicalGpu, cooler: NV_COOLER_TARGET=NV_COOLER_TARGET.ALL,
+                            into: typing.Optional[NV_GPU_COOLER_SETTINGS]=None) -> NV_GPU_COOLER_SETTINGS:
+        return self.NvAPI_GPU_GetCoolerSettings.call_versioned(dev, int(cooler), into=into)
 
-    def get_freqs(self, dev: NvPhysicalGpu, type: int) -> NV_GPU_CLOCK_FREQUENCIES:
-        value = NV_GPU_CLOCK_FREQUENCIES()
-        value.ClockType = type
-        self.NvAPI_GPU_GetAllClockFrequencies(dev, ctypes.pointer(value))
-        return value
+    def get_freqs(self, dev: NvPhysicalGpu, type: int, into: typing.Optional[NV_GPU_CLOCK_FREQUENCIES]=None) -> NV_GPU_CLOCK_FREQUENCIES:
+        def prepare(value):
+            value.ClockType = type
+        return self.NvAPI_GPU_GetAllClockFrequencies.call_versioned(dev, prepare=prepare, into=into)
 
     def restore_coolers(self, dev: NvPhysicalGpu):
         self.NvAPI_GPU_RestoreCoolerSettings(dev, None, 0)
 
-    def get_pstates(self, dev: NvPhysicalGpu) -> NV_GPU_PERF_PSTATES20_INFO:
-        value = NV_GPU_PERF_PSTATES20_INFO()
-        self.NvAPI_GPU_GetPstates20(dev, ctypes.pointer(value))
-        return value
+    def get_pstates(self, dev: NvPhysicalGpu, into: typing.Optional[NV_GPU_PERF_PSTATES20_INFO]=None) -> NV_GPU_PERF_PSTATES20_INFO:
+        return self.NvAPI_GPU_GetPstates20.call_versioned(dev, into=into)
 
-    def get_power_info(self, dev: NvPhysicalGpu) -> NV_GPU_POWER_INFO:
-        value = NV_GPU_POWER_INFO()
-        self.NvAPI_GPU_ClientPowerPoliciesGetInfo(dev, ctypes.pointer(value))
-        return value
+    def get_power_info(self, dev: NvPhysicalGpu, into: typing.Optional[NV_GPU_POWER_INFO]=None) -> NV_GPU_POWER_INFO:
+        return self.NvAPI_GPU_ClientPowerPoliciesGetInfo.call_versioned(dev, into=into)
     
-    def get_power_status(self, dev: NvPhysicalGpu) -> NV_GPU_POWER_STATUS:
-        value = NV_GPU_POWER_STATUS()
-        self.NvAPI_GPU_ClientPowerPoliciesGetStatus(dev, ctypes.pointer(value))
-        return value
+    def get_power_status(self, dev: NvPhysicalGpu, into: typing.Optional[NV_GPU_POWER_STATUS]=None) -> NV_GPU_POWER_STATUS:
+        return self.NvAPI_GPU_ClientPowerPoliciesGetStatus.call_versioned(dev, into=into)
 
-    def get_topology_status(self, dev: NvPhysicalGpu) -> NV_GPU_TOPOLOGY_STATUS:
-        value = NV_GPU_TOPOLOGY_STATUS()
-        self.NvAPI_GPU_ClientPowerTopologyGetStatus(dev, ctypes.pointer(value))
-        return value
+    def get_topology_status(self, dev: NvPhysicalGpu, into: typing.Optional[NV_GPU_TOPOLOGY_STATUS]=None) -> NV_GPU_TOPOLOGY_STATUS:
+        return self.NvAPI_GPU_ClientPowerTopologyGetStatus.call_versioned(dev, into=into)
 
-    def get_power_monitor_info(self, dev: NvPhysicalGpu) -> NV_POWER_MONITOR_INFO:
-        value = NV_POWER_MONITOR_INFO()
-        self.NvAPI_GPU_PowerMonitorGetInfo(dev, ctypes.pointer(value))
-        return value
+    def get_power_monitor_info(self, dev: NvPhysicalGpu, into: typing.Optional[NV_POWER_MONITOR_INFO]=None) -> NV_POWER_MONITOR_INFO:
+        return self.NvAPI_GPU_PowerMonitorGetInfo.call_versioned(dev, into=into)
 
-    def get_power_monitor_status(self, dev: NvPhysicalGpu, info: NV_POWER_MONITOR_INFO) -> NV_POWER_MONITOR_STATUS:
-        value = NV_POWER_MONITOR_STATUS()
-        value.channelMask = info.channelMask
-        self.NvAPI_GPU_PowerMonitorGetStatus(dev, ctypes.pointer(value))
-        return value
+    def get_power_monitor_status(self, dev: NvPhysicalGpu, info: NV_POWER_MONITOR_INFO,
+                                 into: typing.Optional[NV_POWER_MONITOR_STATUS]=None) -> NV_POWER_MONITOR_STATUS:
+        def prepare(value):
+            value.channelMask = info.channelMask
+        return self.NvAPI_GPU_PowerMonitorGetStatus.call_versioned(dev, prepare=prepare, into=into)
 
-    def get_coolers_info(self, dev: NvPhysicalGpu) -> NV_GPU_FAN_COOLERS_INFO:
+    def get_coolers_info(self, dev: NvPhysicalGpu, into: typing.Optional[NV_GPU_FAN_COOLERS_INFO]=None) -> NV_GPU_FAN_COOLERS_INFO:
         if self.__version < 0x9C40:
             raise ValueError('This feature requires new drivers')
-        value = NV_GPU_FAN_COOLERS_INFO()
-        self.NvAPI_GPU_ClientFanCoolersGetInfo(dev, ctypes.pointer(value))
-        return value
+        return self.NvAPI_GPU_ClientFanCoolersGetInfo.call_versioned(dev, into=into)
 
-    def get_coolers_status(self, dev: NvPhysicalGpu) -> NV_GPU_FAN_COOLERS_STATUS:
+    def get_coolers_status(self, dev: NvPhysicalGpu, into: typing.Optional[NV_GPU_FAN_COOLERS_STATUS]=None) -> NV_GPU_FAN_COOLERS_STATUS:
         if self.__version < 0x9C40:
             raise ValueError('This feature requires new drivers')
-        value = NV_GPU_FAN_COOLERS_STATUS()
-        self.NvAPI_GPU_ClientFanCoolersGetStatus(dev, ctypes.pointer(value))
-        return value
+        return self.NvAPI_GPU_ClientFanCoolersGetStatus.call_versioned(dev, into=into)
 
-    def get_coolers_control(self, dev: NvPhysicalGpu) -> NV_GPU_FAN_COOLERS_CONTROL:
+    def get_coolers_control(self, dev: NvPhysicalGpu, into: typing.Optional[NV_GPU_FAN_COOLERS_CONTROL]=None) -> NV_GPU_FAN_COOLERS_CONTROL:
         if self.__version < 0x9C40:
             raise ValueError('This feature requires new drivers')
-        value = NV_GPU_FAN_COOLERS_CONTROL()
-        self.NvAPI_GPU_ClientFanCoolersGetControl(dev, ctypes.pointer(value))
-        return value
+        return self.NvAPI_GPU_ClientFanCoolersGetControl.call_versioned(dev, into=into)
 
     def set_coolers_control(self, dev: NvPhysicalGpu, control: NV_GPU_FAN_COOLERS_CONTROL):
         if self.__version < 0x9C40:
@@ -1113,32 +1470,36 @@ class NvAPI:
         self.NvAPI_GPU_ClientFanCoolersSetControl(dev, ctypes.pointer(control))
 
     def get_core_voltage(self, dev: NvPhysicalGpu) -> float:
-        value = NV_GPU_VOLTAGE_STATUS()
-        self.NvAPI_GPU_GetCurrentVoltage(dev, ctypes.pointer(value))
+        value = self.NvAPI_GPU_GetCurrentVoltage.call_versioned(dev)
         return value.voltage
 
-    def get_boost_mask(self, dev: NvPhysicalGpu) -> NV_GPU_CLOCKBOOST_MASK:
-        value = NV_GPU_CLOCKBOOST_MASK()
-        self.NvAPI_GPU_GetClockBoostMask(dev, ctypes.pointer(value))
-        return value
+    def get_boost_mask(self, dev: NvPhysicalGpu, into: typing.Optional[NV_GPU_CLOCKBOOST_MASK]=None) -> NV_GPU_CLOCKBOOST_MASK:
+        return self.NvAPI_GPU_GetClockBoostMask.call_versioned(dev, into=into)
 
-    def get_boost_table(self, dev: NvPhysicalGpu, boost_mask: NV_GPU_CLOCKBOOST_MASK) -> NV_GPU_CLOCKBOOST_TABLE:
-        value = NV_GPU_CLOCKBOOST_TABLE()
-        for i, m in enumerate(boost_mask.masks):
-            value.masks[i] = m
-        self.NvAPI_GPU_GetClockBoostTable(dev, ctypes.pointer(value))
-        return value
+    def get_boost_table(self, dev: NvPhysicalGpu, boost_mask: NV_GPU_CLOCKBOOST_MASK,
+                        into: typing.Optional[NV_GPU_CLOCKBOOST_TABLE]=None) -> NV_GPU_CLOCKBOOST_TABLE:
+        def prepare(value):
+            for i, m in enumerate(boost_mask.masks):
+                value.masks[i] = m
+        return self.NvAPI_GPU_GetClockBoostTable.call_versioned(dev, prepare=prepare, into=into)
 
-    def get_vfp_curve(self, dev: NvPhysicalGpu, boost_mask: NV_GPU_CLOCKBOOST_MASK) -> NV_GPU_VFP_CURVE:
-        value = NV_GPU_VFP_CURVE()
-        for i, m in enumerate(boost_mask.masks):
-            value.masks[i] = m
-        self.NvAPI_GPU_GetVFPCurve(dev, ctypes.pointer(value))
-        return value
+    def set_boost_table(self, dev: NvPhysicalGpu, table: NV_GPU_CLOCKBOOST_TABLE):
+        '''Writes frequency deltas of points enabled in table.masks.'''
+        self.NvAPI_GPU_SetClockBoostTable(dev, ctypes.pointer(table))
+
+    def get_vfp_curve(self, dev: NvPhysicalGpu, boost_mask: NV_GPU_CLOCKBOOST_MASK,
+                      into: typing.Optional[NV_GPU_VFP_CURVE]=None) -> NV_GPU_VFP_CURVE:
+        def prepare(value):
+            for i, m in enumerate(boost_mask.masks):
+                value.masks[i] = m
+        return self.NvAPI_GPU_GetVFPCurve.call_versioned(dev, prepare=prepare, into=into)
+
+    def get_performance_status(self, dev: NvPhysicalGpu,
+                               into: typing.Optional[NV_GPU_PERFORMANCE_STATUS]=None) -> NV_GPU_PERFORMANCE_STATUS:
+        return self.NvAPI_GPU_PerfPoliciesGetStatus.call_versioned(dev, into=into)
 
     def get_performance_limit(self, dev: NvPhysicalGpu) -> PerfCapReason:
-        value = NV_GPU_PERFORMANCE_STATUS()
-        self.NvAPI_GPU_PerfPoliciesGetStatus(dev, ctypes.pointer(value))
+        value = self.NvAPI_GPU_PerfPoliciesGetStatus.call_versioned(dev)
         return value.limit
 
     def get_ram_type(self, dev: NvPhysicalGpu) -> RamType:
@@ -1146,35 +1507,25 @@ class NvAPI:
         self.NvAPI_GPU_GetRamType(dev, ctypes.pointer(value))
         return RamType(value.value)
 
-    def get_memory_info(self, dev: NvPhysicalGpu) -> typing.Union[DisplayDriverMemoryInfoV3, DisplayDriverMemoryInfoV2, DisplayDriverMemoryInfoV1]:
-        for klass in (DisplayDriverMemoryInfoV3, DisplayDriverMemoryInfoV2, DisplayDriverMemoryInfoV1):
-            value = klass()
-            try:
-                self.NvAPI_GPU_GetMemoryInfo(dev, ctypes.pointer(value))
-            except NvError as ex:
-                if ex == 'NVAPI_INCOMPATIBLE_STRUCT_VERSION':
-                    continue
-                raise
-            return value
-        raise NvError('Not found suitable memory info struct', 'NVAPI_INCOMPATIBLE_STRUCT_VERSION')
-
-    def get_clocklock(self, dev: NvPhysicalGpu) -> PrivateClockBoostLockV2:
-        value = PrivateClockBoostLockV2()
-        self.NvAPI_GPU_GetClockBoostLock(dev, ctypes.pointer(value))
-        return value
+    def get_memory_info(self, dev: NvPhysicalGpu, into: typing.Optional[NvVersioned]=None
+                        ) -> typing.Union[DisplayDriverMemoryInfoV3, DisplayDriverMemoryInfoV2, DisplayDriverMemoryInfoV1]:
+        return self.NvAPI_GPU_GetMemoryInfo.call_versioned(dev, into=into)
+
+    def get_clocklock(self, dev: NvPhysicalGpu, into: typing.Optional[PrivateClockBoostLockV2]=None) -> PrivateClockBoostLockV2:
+        return self.NvAPI_GPU_GetClockBoostLock.call_versioned(dev, into=into)
 
     def get_current_pstate(self, dev: NvPhysicalGpu) -> PerformanceStateId:
         value = ctypes.c_int()
         self.NvAPI_GPU_GetCurrentPstate(dev, ctypes.pointer(value))
         return PerformanceStateId(value.value)
 
-    def get_dynamic_pstates_info(self, dev: NvPhysicalGpu) -> DynamicPerformanceStatesInfoV1:
-        value = DynamicPerformanceStatesInfoV1()
-        self.NvAPI_GPU_GetDynamicPstatesInfoEx(dev, ctypes.pointer(value))
-        return value
+    def get_dynamic_pstates_info(self, dev: NvPhysicalGpu, into: typing.Optional[DynamicPerformanceStatesInfoV1]=None) -> DynamicPerformanceStatesInfoV1:
+        return self.NvAPI_GPU_GetDynamicPstatesInfoEx.call_versioned(dev, into=into)
 
-    def get_active_apps(self, dev: NvPhysicalGpu) -> typing.Tuple[PrivateActiveApplicationV2]:
+    def get_active_apps(self, dev: NvPhysicalGpu, into: typing.Optional[PrivateActiveApplicationArray]=None
+                        ) -> typing.Tuple[PrivateActiveApplicationV2]:
+        '''Returns running applications, with `into` given they are views into it valid until it is reused.'''
         count = ctypes.c_uint32()
-        apps = PrivateActiveApplicationArray()
+        apps = PrivateActiveApplicationArray() if into is None else into
         self.NvAPI_GPU_QueryActiveApps(dev, apps, ctypes.pointer(count))
         return tuple(apps[:count.value])
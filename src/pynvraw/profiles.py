@@ -0,0 +1,156 @@
+'''Declarative GPU settings profiles and applying them to all local GPUs in parallel.
+
+A profile file is JSON mapping profile names to rules; a rule maps a selector to settings of Gpu.configure():
+
+    {
+     "training": {
+      "*": {"power_limit": 100, "fan": "auto"},
+      "NVIDIA GeForce RTX 3090": {"core": 100, "memory": 500},
+      "0000:41:00.0": {"core": 50}
+     },
+     "inference": {"*": {"core": 0, "memory": 0, "power_limit": 70}}
+    }
+
+Selector "*" matches every GPU, a PCI bus id ("domain:bus:device.function", domain and function optional, hex)
+matches one GPU, anything else is a full GPU name. nvapi reports no PCI domain, so bus ids with a non-zero one
+are rejected. Settings of all matching rules are merged, bus id rules overriding name rules overriding "*".
+Apply from a shell with
+
+    python -m pynvraw.profiles profiles.json training [--dry-run]
+'''
+
+import argparse
+import concurrent.futures
+import json
+import re
+import sys
+import typing
+
+from .gpu import Gpu
+from .configure import Change, ConfigureError
+
+ANY = '*'
+SETTINGS = ('core', 'memory', 'power_limit', 'fan')
+
+_BUS_ID = re.compile(r'^(?:([0-9a-fA-F]{1,8}):)?([0-9a-fA-F]{1,2}):([0-9a-fA-F]{1,2})(?:\.[0-7])?$')
+
+def parse_bus_id(text: str) -> typing.Optional[typing.Tuple[int, int]]:
+    '''Returns (bus, slot) of a PCI bus id string, None if `text` is not one.
+    Raises ValueError for a non-zero PCI domain, which GPUs cannot be told apart by.'''
+    match = _BUS_ID.match(text.strip())
+    if match is None:
+        return None
+    if match.group(1) is not None and int(match.group(1), 16) != 0:
+        raise ValueError(f'PCI domain of {text!r} is not 0, nvapi only identifies GPUs by bus and device')
+    return int(match.group(2), 16), int(match.group(3), 16)
+
+def format_bus_id(bus: int, slot: int) -> str:
+    return f'0000:{bus:02x}:{slot:02x}.0'
+
+def _check_settings(where: str, settings: typing.Any) -> typing.Dict[str, typing.Any]:
+    if not isinstance(settings, dict):
+        raise ValueError(f'{where}: settings must be an object, got {settings!r}')
+    unknown = set(settings) - set(SETTINGS)
+    if unknown:
+        raise ValueError(f'{where}: unknown settings {", ".join(sorted(unknown))}, expected some of {", ".join(SETTINGS)}')
+    for name, value in settings.items():
+        if name == 'fan' and (value == 'auto' or isinstance(value, list) and all(isinstance(v, int) for v in value)):
+            continue
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise ValueError(f'{where}: bad value for {name}: {value!r}')
+    return {name: tuple(value) if isinstance(value, list) else value for name, value in settings.items()}
+
+class Profile:
+    '''Named set of rules, see module docs for selectors and precedence.'''
+    def __init__(self, name: str, rules: typing.Dict[str, typing.Dict[str, typing.Any]]):
+        self.name = name
+        self.default = {}
+        self.by_name = {}
+        self.by_bus = {}
+        for selector, settings in rules.items():
+            settings = _check_settings(f'{name}[{selector!r}]', settings)
+            bus_slot = parse_bus_id(selector)
+            if selector == ANY:
+                self.default = settings
+            elif bus_slot is not None:
+                self.by_bus[bus_slot] = settings
+            else:
+                self.by_name[selector] = settings
+
+    def settings_for(self, name: str, bus: int, slot: int) -> typing.Dict[str, typing.Any]:
+        '''Returns merged settings for a GPU of given name and PCI location.'''
+        result = dict(self.default)
+        result.update(self.by_name.get(name, {}))
+        result.update(self.by_bus.get((bus, slot), {}))
+        return result
+
+def load_profiles(path: str) -> typing.Dict[str, Profile]:
+    '''Reads a profile file, raises ValueError if it is malformed.'''
+    with open(path, encoding='utf8') as inp:
+        data = json.load(inp)
+    if not isinstance(data, dict) or not all(isinstance(rules, dict) for rules in data.values()):
+        raise ValueError(f'{path}: expected an object mapping profile names to rules')
+    return {name: Profile(name, rules) for name, rules in data.items()}
+
+class ApplyResult(typing.NamedTuple):
+    bus_id: str
+    name: str
+    settings: typing.Dict[str, typing.Any] # what the profile asked for
+    changes: typing.List[Change] # what differed (and was written unless dry run)
+    error: typing.Optional[Exception] # ConfigureError (see its rolled_back), ValueError, NvError or anything else raised
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def _apply_one(gpu: Gpu, profile: Profile, verify: bool, dry_run: bool) -> ApplyResult:
+    bus_id, name, settings = '?', '?', {}
+    try:
+        bus, slot = gpu.api.get_bus_slot(gpu.handle)
+        bus_id = format_bus_id(bus, slot)
+        name = gpu.name
+        settings = profile.settings_for(name, bus, slot)
+        changes = gpu.configure(**settings, verify=verify, dry_run=dry_run)
+    except ConfigureError as ex:
+        return ApplyResult(bus_id, name, settings, list(ex.changes), ex)
+    except Exception as ex: # reported per GPU so one failure does not hide results of the others
+        return ApplyResult(bus_id, name, settings, [], ex)
+    return ApplyResult(bus_id, name, settings, changes, None)
+
+def apply_profile(profile: Profile, gpus: typing.Optional[typing.Sequence[Gpu]]=None, verify: bool=True,
+                  dry_run: bool=False, max_workers: typing.Optional[int]=None) -> typing.List[ApplyResult]:
+    '''Configures every GPU (all local ones by default) at once, one pool thread per GPU, so the whole apply
+    takes about as long as the slowest GPU. A failing GPU is rolled back and reported, others are unaffected.
+    Results are in the order of `gpus`.'''
+    if gpus is None:
+        from . import get_gpus
+        gpus = get_gpus()
+    gpus = tuple(gpus)
+    if not gpus:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(gpus),
+                                               thread_name_prefix='pynvraw-profile') as pool:
+        futures = [pool.submit(_apply_one, gpu, profile, verify, dry_run) for gpu in gpus]
+        return [future.result() for future in futures]
+
+def main(argv: typing.Optional[typing.Sequence[str]]=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m pynvraw.profiles', description='Applies a settings profile to all local GPUs.')
+    parser.add_argument('path', help='JSON profile file')
+    parser.add_argument('profile', help='name of the profile to apply')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would change')
+    parser.add_argument('--no-verify', action='store_true', help='do not read settings back after writing')
+    args = parser.parse_args(argv)
+
+    profiles = load_profiles(args.path)
+    if args.profile not in profiles:
+        parser.error(f'no profile {args.profile!r} in {args.path}, have: {", ".join(sorted(profiles))}')
+    results = apply_profile(profiles[args.profile], verify=not args.no_verify, dry_run=args.dry_run)
+    for result in results:
+        status = 'OK' if result.ok else f'FAILED: {result.error}'
+        print(f'{result.bus_id} {result.name}: {status}')
+        for change in result.changes:
+            print(f'    {change.setting}: {change.old} -> {change.new}')
+    return 0 if all(result.ok for result in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
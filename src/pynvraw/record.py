@@ -0,0 +1,166 @@
+'''Recording raw nvapi calls to a file and replaying them without the driver.
+
+File format (little-endian): magic b'NVRPLAY1', then a sequence of calls:
+    offset uint32, status int32, latency_ns uint64, argument count uint16, then per argument:
+        kind byte: b'n' (None), b'i' (int, 8 bytes), b'v' (struct passed by value)
+                   or b'p' (pointer, array or byref - memory may be changed by the call)
+        uint32 size and bytes of the argument before the call,
+        for b'p' also uint32 size and bytes of the pointed memory after the call
+Replay looks calls up by offset and input bytes of all arguments; repeated identical calls
+are served recorded outputs in their original order, cycling when they are exhausted.
+'''
+
+import atexit
+import collections
+import contextlib
+import ctypes
+import struct
+import threading
+import time
+import typing
+
+from .backend import Backend, get_backend, set_backend, _target
+
+MAGIC = b'NVRPLAY1'
+_CALL = struct.Struct('<IiQH')
+_SIZE = struct.Struct('<I')
+_INT = struct.Struct('<q')
+
+def _encode_input(arg) -> typing.Tuple[bytes, bytes, typing.Any]:
+    '''Returns kind, input bytes and pointed memory object (if any) of an argument.'''
+    if arg is None:
+        return b'n', b'', None
+    if isinstance(arg, int):
+        return b'i', _INT.pack(arg), None
+    target = _target(arg)
+    if target is not None:
+        return b'p', bytes(target), target
+    return b'v', bytes(arg), None
+
+class _Call(typing.NamedTuple):
+    offset: int
+    inputs: typing.Tuple[bytes]
+    outputs: typing.Tuple[typing.Optional[bytes]]
+    status: int
+    latency: float
+
+def _write_call(out, call: _Call, kinds: typing.Sequence[bytes]):
+    parts = [_CALL.pack(call.offset, call.status, int(call.latency * 1e9), len(kinds))]
+    for kind, data, result in zip(kinds, call.inputs, call.outputs):
+        parts.extend((kind, _SIZE.pack(len(data)), data))
+        if kind == b'p':
+            parts.extend((_SIZE.pack(len(result)), result))
+    out.write(b''.join(parts))
+
+def read_calls(path: str) -> typing.Iterator[_Call]:
+    '''Iterates over calls stored in a recording.'''
+    with open(path, 'rb') as inp:
+        data = inp.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a pynvraw recording')
+    pos = len(MAGIC)
+    while pos < len(data):
+        offset, status, latency, count = _CALL.unpack_from(data, pos)
+        pos += _CALL.size
+        inputs, outputs = [], []
+        for _ in range(count):
+            kind = data[pos:pos + 1]
+            size, = _SIZE.unpack_from(data, pos + 1)
+            pos += 1 + _SIZE.size
+            inputs.append(data[pos:pos + size])
+            pos += size
+            if kind == b'p':
+                size, = _SIZE.unpack_from(data, pos)
+                pos += _SIZE.size
+                outputs.append(data[pos:pos + size])
+                pos += size
+            else:
+                outputs.append(None)
+        yield _Call(offset, tuple(inputs), tuple(outputs), status, latency / 1e9)
+
+class RecordingBackend(Backend):
+    '''Passes calls through to `inner` backend logging their arguments, results and latencies to `path`.'''
+    def __init__(self, inner: Backend, path: str):
+        self.inner = inner
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__out = open(path, 'wb')
+        self.__out.write(MAGIC)
+        atexit.register(self.close)
+
+    def resolve(self, method) -> typing.Optional[typing.Callable]:
+        func = self.inner.resolve(method)
+        if func is None:
+            return None
+        offset = method.offset
+        def recorded(*args):
+            encoded = [_encode_input(arg) for arg in args]
+            start = time.perf_counter()
+            status = func(*args)
+            latency = time.perf_counter() - start
+            outputs = tuple(bytes(target) if kind == b'p' else None for kind, _, target in encoded)
+            call = _Call(offset, tuple(data for _, data, _ in encoded), outputs, status, latency)
+            with self.__lock:
+                if not self.__out.closed:
+                    _write_call(self.__out, call, [kind for kind, _, _ in encoded])
+            return status
+        return recorded
+
+    def close(self):
+        with self.__lock:
+            self.__out.close()
+        atexit.unregister(self.close)
+
+class ReplayBackend(Backend):
+    '''Serves calls from a recording made by RecordingBackend, no driver is needed.
+
+    With `latency` set to a positive factor each call sleeps for its recorded latency multiplied by it.
+    Calls missing from the recording return `missing_status` or raise LookupError if it is None.
+    '''
+    def __init__(self, path: str, latency: float=0.0, missing_status: typing.Optional[int]=None):
+        self.path = path
+        self.latency = latency
+        self.missing_status = missing_status
+        self.__calls = collections.defaultdict(list)
+        self.__next = collections.Counter()
+        self.__lock = threading.Lock()
+        for call in read_calls(path):
+            self.__calls[call.offset, call.inputs].append(call)
+
+    def __lookup(self, offset: int, inputs: typing.Tuple[bytes]) -> typing.Optional[_Call]:
+        key = offset, inputs
+        calls = self.__calls.get(key)
+        if not calls:
+            return None
+        with self.__lock:
+            idx = self.__next[key]
+            self.__next[key] = (idx + 1) % len(calls)
+        return calls[idx]
+
+    def resolve(self, method) -> typing.Optional[typing.Callable]:
+        offset = method.offset
+        def replayed(*args):
+            encoded = [_encode_input(arg) for arg in args]
+            call = self.__lookup(offset, tuple(data for _, data, _ in encoded))
+            if call is None:
+                if self.missing_status is None:
+                    raise LookupError(f'Call of {getattr(method, "name", hex(offset))} with such arguments was not recorded')
+                return self.missing_status
+            if self.latency > 0:
+                time.sleep(call.latency * self.latency)
+            for (kind, _, target), result in zip(encoded, call.outputs):
+                if kind == b'p':
+                    ctypes.memmove(ctypes.addressof(target), result, min(len(result), ctypes.sizeof(target)))
+            return call.status
+        return replayed
+
+@contextlib.contextmanager
+def recording(path: str):
+    '''Records all nvapi calls made inside the `with` block to `path`.'''
+    recorder = RecordingBackend(get_backend(), path)
+    previous = set_backend(recorder)
+    try:
+        yield recorder
+    finally:
+        set_backend(previous)
+        recorder.close()
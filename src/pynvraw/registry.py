@@ -0,0 +1,71 @@
+'''Canonical Gpu objects, so per-GPU caches (capabilities, bound calls, buffers) survive across lookups.'''
+
+import threading
+import typing
+
+from .nvapi_api import NvAPI, NvPhysicalGpu
+from .gpu import Gpu
+
+class GpuRegistry:
+    '''Enumerates GPUs of an NvAPI once and always returns the same Gpu per physical device,
+    looked up by handle, PCI (bus, slot) or CUDA ordinal.'''
+    def __init__(self, api: NvAPI):
+        self.api = api
+        self.__gpus = None
+        self.__by_handle = None
+        self.__by_bus = None
+        self.__by_cuda = None
+        self.__unmapped_cuda = {} # CUDA ordinal -> why it has no nvapi GPU
+        self.__lock = threading.Lock()
+
+    def __enumerate(self):
+        with self.__lock:
+            if self.__gpus is None:
+                gpus = tuple(Gpu(handle, self.api) for handle in self.api.gpu_handles)
+                self.__by_handle = {bytes(gpu.handle): gpu for gpu in gpus}
+                self.__by_bus = {bus_slot: self.__by_handle[bytes(handle)] for bus_slot, handle in self.api.bus_index.items()}
+                self.__gpus = gpus
+
+    @property
+    def gpus(self) -> typing.Tuple[Gpu]:
+        if self.__gpus is None:
+            self.__enumerate()
+        return self.__gpus
+
+    def by_handle(self, handle: NvPhysicalGpu) -> Gpu:
+        if self.__gpus is None:
+            self.__enumerate()
+        try:
+            return self.__by_handle[bytes(handle)]
+        except KeyError:
+            raise ValueError(f'Unknown GPU handle {handle}') from None
+
+    def by_bus(self, bus: int, slot: int) -> Gpu:
+        if self.__gpus is None:
+            self.__enumerate()
+        try:
+            return self.__by_bus[bus, slot]
+        except KeyError:
+            raise ValueError(f'Cannot find a GPU with bus={bus} and slot={slot}') from None
+
+    def cuda_map(self) -> typing.Dict[int, Gpu]:
+        '''Maps every CUDA device ordinal to its Gpu, querying CUDA once.
+        Ordinals without an nvapi counterpart are left out, by_cuda() reports why.'''
+        if self.__by_cuda is None:
+            from .cuda_api import get_cuda_device_count, get_cuda_bus_slot
+            by_cuda, unmapped = {}, {}
+            for ordinal in range(get_cuda_device_count()):
+                try:
+                    by_cuda[ordinal] = self.by_bus(*get_cuda_bus_slot(ordinal))
+                except ValueError as ex:
+                    unmapped[ordinal] = ex
+            self.__by_cuda, self.__unmapped_cuda = by_cuda, unmapped
+        return self.__by_cuda
+
+    def by_cuda(self, ordinal: int) -> Gpu:
+        try:
+            return self.cuda_map()[ordinal]
+        except KeyError:
+            if ordinal in self.__unmapped_cuda:
+                raise ValueError(f'CUDA device {ordinal}: {self.__unmapped_cuda[ordinal]}') from None
+            raise ValueError(f'No CUDA device {ordinal}') from None
@@ -0,0 +1,121 @@
+'''Time-in-state histograms of P-states and core/memory clocks.
+
+Each sample attributes the time since the previous sample to the state seen by the previous sample,
+measured with time.monotonic() so wall clock steps do not distort it, into fixed bins backed by array('d'), so memory does not grow with the number of samples.
+Feed it by calling sample() or by passing add as the sink of a Sampler reading FIELDS:
+
+    tracker = ResidencyTracker(gpu)
+    with Sampler(gpu, fields=ResidencyTracker.FIELDS, interval=0.1, capacity=1, sink=tracker.add):
+        run_job()
+    print(tracker.pstates)
+'''
+
+import array
+import math
+import threading
+import time
+import typing
+
+from .gpu import Gpu, _as_float
+from .nvapi_api import PerformanceStateId, NVAPI_MAX_GPU_PSTATE20_PSTATES
+
+class ClockBin(typing.NamedTuple):
+    low: float # MHz, inclusive
+    high: float # MHz, exclusive; inf for the overflow bin
+    seconds: float
+
+class _Histogram:
+    def __init__(self, bin_width: float, limit: float):
+        self.bin_width = bin_width
+        self.count = int(math.ceil(limit / bin_width))
+        # last bin collects everything at or above limit
+        self.seconds = array.array('d', bytes(8 * (self.count + 1)))
+
+    def add(self, value: float, seconds: float):
+        self.seconds[min(int(value // self.bin_width), self.count)] += seconds
+
+    def bins(self) -> typing.List[ClockBin]:
+        return [ClockBin(low=idx * self.bin_width, high=(idx + 1) * self.bin_width if idx < self.count else math.inf,
+                         seconds=seconds)
+                for idx, seconds in enumerate(self.seconds) if seconds]
+
+    def clear(self):
+        self.seconds = array.array('d', bytes(8 * len(self.seconds)))
+
+class ResidencyTracker:
+    '''P-state and clock residency of a GPU since last reset(); unsupported or failed reads are not counted.'''
+    FIELDS = ('pstate', 'core_clock', 'memory_clock')
+
+    def __init__(self, gpu: Gpu, clock_bin: float=15.0, max_core_clock: float=3000.0, max_memory_clock: float=12000.0):
+        if clock_bin <= 0:
+            raise ValueError(f'Clock bin must be positive, got {clock_bin}')
+        self.gpu = gpu
+        self.__pstates = array.array('d', bytes(8 * (NVAPI_MAX_GPU_PSTATE20_PSTATES + 1)))
+        self.__core = _Histogram(clock_bin, max_core_clock)
+        self.__memory = _Histogram(clock_bin, max_memory_clock)
+        self.__previous = None # (time.monotonic(), values) of the previous sample
+        self.__total = 0.0
+        self.__lock = threading.Lock()
+
+    def sample(self):
+        '''Reads the GPU and accounts time since previous sample.'''
+        reading = self.gpu.read(*self.FIELDS)
+        self.add(reading.timestamp, [_as_float(value) for value in reading])
+
+    def add(self, timestamp: float, values: typing.Sequence[float]):
+        '''Accounts a sample of FIELDS (NaN if unknown) taken just now. `timestamp` (time.time()) is only
+        accepted for Sampler's `sink` signature: intervals are measured on the monotonic clock instead.'''
+        now = time.monotonic()
+        with self.__lock:
+            previous, self.__previous = self.__previous, (now, tuple(values))
+            if previous is None:
+                return
+            seconds = now - previous[0]
+            if seconds <= 0:
+                return
+            pstate, core, memory = previous[1]
+            if not math.isnan(pstate):
+                self.__total += seconds
+                self.__pstates[min(int(pstate), NVAPI_MAX_GPU_PSTATE20_PSTATES)] += seconds
+            if not math.isnan(core):
+                self.__core.add(core, seconds)
+            if not math.isnan(memory):
+                self.__memory.add(memory, seconds)
+
+    def reset(self):
+        '''Forgets accumulated time, e.g. at the start of a job; the next sample starts accounting again.'''
+        with self.__lock:
+            for idx in range(len(self.__pstates)):
+                self.__pstates[idx] = 0.0
+            self.__core.clear()
+            self.__memory.clear()
+            self.__previous = None
+            self.__total = 0.0
+
+    @property
+    def total(self) -> float:
+        '''Seconds with a known P-state accounted since reset.'''
+        return self.__total
+
+    @property
+    def pstates(self) -> typing.Dict[PerformanceStateId, float]:
+        '''Seconds spent in each P-state seen.'''
+        with self.__lock:
+            return {PerformanceStateId(idx): seconds for idx, seconds in enumerate(self.__pstates) if seconds}
+
+    def fraction(self, pstate: PerformanceStateId) -> float:
+        '''Share of accounted time spent in `pstate`.'''
+        with self.__lock:
+            return self.__pstates[int(pstate)] / self.__total if self.__total else 0.0
+
+    @property
+    def core_clocks(self) -> typing.List[ClockBin]:
+        '''Non-empty core clock bins.'''
+        with self.__lock:
+            return self.__core.bins()
+
+    @property
+    def memory_clocks(self) -> typing.List[ClockBin]:
+        '''Non-empty memory clock bins.'''
+        with self.__lock:
+            return self.__memory.bins()
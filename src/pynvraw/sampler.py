@@ -0,0 +1,145 @@
+'''Background high-frequency sampling of GPU metrics into fixed-size ring buffers.'''
+
+import array
+import math
+import threading
+import time
+import typing
+
+from .gpu import Gpu, NUMERIC_READ_FIELDS, _as_float
+
+class RingBuffer:
+    '''Fixed-capacity circular buffer of doubles backed by array('d'), oldest values are overwritten.'''
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError(f'Capacity must be positive, got {capacity}')
+        self.capacity = capacity
+        self.__data = array.array('d', bytes(8 * capacity))
+        self.__pos = 0
+        self.__count = 0
+
+    def append(self, value: float):
+        self.__data[self.__pos] = value
+        self.__pos = (self.__pos + 1) % self.capacity
+        if self.__count < self.capacity:
+            self.__count += 1
+
+    def clear(self):
+        self.__pos = self.__count = 0
+
+    def __len__(self):
+        return self.__count
+
+    @property
+    def last(self) -> float:
+        if not self.__count:
+            raise IndexError('RingBuffer is empty')
+        return self.__data[self.__pos - 1]
+
+    def values(self) -> array.array:
+        '''Returns a chronologically ordered copy of stored values.'''
+        if self.__count < self.capacity:
+            return self.__data[:self.__count]
+        return self.__data[self.__pos:] + self.__data[:self.__pos]
+
+class Sampler:
+    '''Samples given fields of a GPU in a background thread every `interval` seconds.
+
+    Sampling is scheduled against monotonic deadlines, so slow reads do not make the sampler drift;
+    if a read overruns one or more deadlines those ticks are skipped and counted in `missed`.
+    Each field and the sample timestamps (as time.time()) are kept in RingBuffer-s of `capacity` samples,
+    values unsupported by the GPU are stored as NaN. Every sample is also passed to `sink(timestamp, values)`
+    if given, e.g. ColumnStore.append to persist the whole history.
+    '''
+    def __init__(self, gpu: Gpu, fields: typing.Sequence[str]=NUMERIC_READ_FIELDS, interval: float=0.1, capacity: int=36000,
+                 sink: typing.Optional[typing.Callable[[float, typing.Sequence[float]], None]]=None):
+        if interval <= 0:
+            raise ValueError(f'Interval must be positive, got {interval}')
+        bad = [name for name in fields if name not in NUMERIC_READ_FIELDS]
+        if bad:
+            raise ValueError(f'Non-numeric or unknown fields: {", ".join(bad)}')
+        self.gpu = gpu
+        self.fields = tuple(fields)
+        self.interval = interval
+        self.sink = sink
+        self.timestamps = RingBuffer(capacity)
+        self.buffers = {name: RingBuffer(capacity) for name in self.fields}
+        self.missed = 0
+        self.last_error = None
+        self.__columns = tuple(self.buffers[name] for name in self.fields)
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        if self.running:
+            raise RuntimeError('Sampler is already running')
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name='pynvraw-sampler', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def sample_once(self):
+        '''Takes one sample synchronously and appends it to the buffers.
+        A failing read is stored as NaN-s and a failing sink is skipped, the error goes to `last_error`.'''
+        try:
+            reading = self.gpu.read(*self.fields)
+        except Exception as ex: # whatever happens the schedule must go on
+            self.last_error = ex
+            timestamp, values = time.time(), (math.nan,) * len(self.fields)
+        else:
+            timestamp, values = reading.timestamp, [_as_float(value) for value in reading]
+        with self.__lock:
+            self.timestamps.append(timestamp)
+            for column, value in zip(self.__columns, values):
+                column.append(value)
+        if self.sink is not None:
+            try:
+                self.sink(timestamp, values)
+            except Exception as ex:
+                self.last_error = ex
+
+    def __run(self):
+        start = time.monotonic()
+        tick = 0
+        while True:
+            self.sample_once()
+            tick += 1
+            now = time.monotonic()
+            deadline = start + tick * self.interval
+            if now > deadline:
+                behind = int((now - start) / self.interval) + 1
+                self.missed += behind - tick
+                tick = behind
+                deadline = start + tick * self.interval
+            if self.__stop.wait(deadline - now):
+                break
+
+    def snapshot(self) -> typing.Dict[str, array.array]:
+        '''Returns consistent chronological copies of all buffers, timestamps are under "timestamp" key.'''
+        with self.__lock:
+            result = {'timestamp': self.timestamps.values()}
+            result.update((name, buffer.values()) for name, buffer in self.buffers.items())
+        return result
+
+    def clear(self):
+        with self.__lock:
+            self.timestamps.clear()
+            for column in self.__columns:
+                column.clear()
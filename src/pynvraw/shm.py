@@ -0,0 +1,226 @@
+'''Publishing GPU telemetry to shared memory so many processes can read one poller.
+
+Segment layout (native byte order):
+    0   magic           8s
+    8   row count       uint32
+    12  field count     uint32
+    16  metadata size   uint32
+    20  padding         uint32
+    24  sequence        uint64  (seqlock: odd while a write is in progress)
+    32  timestamp       float64 (time.time() of the sample)
+    40  values          float64[rows * fields], row-major, NaN if unsupported
+    ..  metadata        utf8 JSON {"fields": [...], "labels": [...]}
+'''
+
+import json
+import math
+import struct
+import threading
+import time
+import typing
+
+try:
+    from multiprocessing import shared_memory
+except ImportError: # Python < 3.8
+    shared_memory = None
+
+from .gpu import Gpu, NUMERIC_READ_FIELDS, _as_float
+from .status import NvError
+
+MAGIC = b'PYNVSHM1'
+_HEADER = struct.Struct('=8sIIII')
+_SEQ_OFFSET = 24
+_DATA_OFFSET = 40
+_SPINS = 100 # reads retried back to back before backing off
+_BACKOFF = 0.0001 # seconds slept between retries after that
+
+def _require_shared_memory():
+    if shared_memory is None:
+        raise ImportError('Telemetry sharing requires multiprocessing.shared_memory (Python 3.8+)')
+
+class TelemetrySnapshot(typing.NamedTuple):
+    sequence: int
+    timestamp: float
+    values: typing.Tuple[typing.Tuple[float]]
+
+_attach_lock = threading.Lock()
+
+def _attach(name: str) -> 'shared_memory.SharedMemory':
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    # before Python 3.13 attaching registers the segment in resource tracker which would unlink it
+    # when the reader exits, pulling it from under the publisher
+    from multiprocessing import resource_tracker
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name)
+        finally:
+            resource_tracker.register = register
+
+class TelemetryPublisher:
+    '''Samples GPUs (or a custom `source`) and publishes results to a named shared memory segment.
+
+    `source` is a callable returning one sequence of values per row, in the order of `fields`;
+    by default rows are `gpus` (all GPUs in the system if not given) read via Gpu.read().
+    '''
+    def __init__(self, name: typing.Optional[str]=None, gpus: typing.Optional[typing.Sequence[Gpu]]=None,
+                 fields: typing.Sequence[str]=NUMERIC_READ_FIELDS, interval: float=1.0,
+                 source: typing.Optional[typing.Callable[[], typing.Iterable[typing.Sequence[float]]]]=None,
+                 labels: typing.Optional[typing.Sequence[str]]=None):
+        _require_shared_memory()
+        self.fields = tuple(fields)
+        self.interval = interval
+        if source is None:
+            if gpus is None:
+                from . import get_gpus
+                gpus = get_gpus()
+            gpus = tuple(gpus)
+            if labels is None:
+                labels = [gpu.name for gpu in gpus]
+            source = lambda: [self.__read_gpu(gpu) for gpu in gpus]
+        elif labels is None:
+            raise ValueError('Labels of rows must be given for custom source')
+        self.labels = tuple(labels)
+        self.source = source
+        self.last_error = None
+
+        meta = json.dumps({'fields': self.fields, 'labels': self.labels}).encode('utf8')
+        count = len(self.labels) * len(self.fields)
+        self.__shm = shared_memory.SharedMemory(name, create=True, size=_DATA_OFFSET + 8 * count + len(meta))
+        self.name = self.__shm.name
+        buf = self.__shm.buf
+        _HEADER.pack_into(buf, 0, MAGIC, len(self.labels), len(self.fields), len(meta), 0)
+        buf[_DATA_OFFSET + 8 * count:_DATA_OFFSET + 8 * count + len(meta)] = meta
+        self.__seq = buf[_SEQ_OFFSET:_DATA_OFFSET].cast('Q')
+        self.__timestamp = buf[_SEQ_OFFSET + 8:_DATA_OFFSET].cast('d')
+        self.__values = buf[_DATA_OFFSET:_DATA_OFFSET + 8 * count].cast('d')
+        self.__values[:] = memoryview(struct.pack(f'={count}d', *([math.nan] * count))).cast('d')
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def __read_gpu(self, gpu: Gpu) -> typing.Sequence[float]:
+        try:
+            return gpu.read(*self.fields)
+        except NvError as ex:
+            self.last_error = ex
+            return (None,) * len(self.fields)
+
+    def publish(self, rows: typing.Iterable[typing.Sequence[float]], timestamp: typing.Optional[float]=None):
+        '''Writes given rows under seqlock so readers never see a partially written snapshot.'''
+        values = [_as_float(value) for row in rows for value in row]
+        if len(values) != len(self.__values):
+            raise ValueError(f'Expected {len(self.__values)} values, got {len(values)}')
+        seq = self.__seq[0]
+        self.__seq[0] = seq + 1
+        self.__timestamp[0] = time.time() if timestamp is None else timestamp
+        self.__values[:] = memoryview(struct.pack(f'={len(values)}d', *values)).cast('d')
+        self.__seq[0] = seq + 2
+
+    def publish_once(self):
+        '''Samples the source once and publishes the result.'''
+        self.publish(self.source())
+
+    def __run(self):
+        start = time.monotonic()
+        tick = 0
+        while True:
+            try:
+                self.publish_once()
+            except Exception as ex:
+                # keep publishing; NaN rows with a fresh timestamp tell readers the data is unavailable
+                self.last_error = ex
+                self.publish([(None,) * len(self.fields)] * len(self.labels))
+            tick = max(tick + 1, int((time.monotonic() - start) / self.interval) + 1)
+            if self.__stop.wait(max(start + tick * self.interval - time.monotonic(), 0)):
+                break
+
+    def start(self):
+        if self.__thread is not None:
+            raise RuntimeError('Publisher is already running')
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name='pynvraw-publisher', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def close(self):
+        '''Stops publishing and destroys the shared memory segment.'''
+        self.stop()
+        for view in (self.__seq, self.__timestamp, self.__values):
+            view.release()
+        self.__shm.close()
+        self.__shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class TelemetryReader:
+    '''Attaches to a segment of TelemetryPublisher; reading the latest snapshot does no syscalls nor driver calls.'''
+    def __init__(self, name: str):
+        _require_shared_memory()
+        self.__shm = _attach(name)
+        buf = self.__shm.buf
+        magic, rows, fields, meta_size, _ = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            self.__shm.close()
+            raise ValueError(f'Shared memory {name!r} is not a pynvraw telemetry segment')
+        count = rows * fields
+        meta = json.loads(bytes(buf[_DATA_OFFSET + 8 * count:_DATA_OFFSET + 8 * count + meta_size]).decode('utf8'))
+        self.name = name
+        self.fields = tuple(meta['fields'])
+        self.labels = tuple(meta['labels'])
+        self.__seq = buf[_SEQ_OFFSET:_DATA_OFFSET].cast('Q')
+        self.__timestamp = buf[_SEQ_OFFSET + 8:_DATA_OFFSET].cast('d')
+        self.__values = buf[_DATA_OFFSET:_DATA_OFFSET + 8 * count].cast('d')
+
+    def latest(self, timeout: float=1.0) -> TelemetrySnapshot:
+        '''Returns the latest consistent snapshot; sequence is 0 if nothing was published yet.
+        Raises TimeoutError if no consistent snapshot could be read within `timeout` seconds
+        (e.g. the publisher died in the middle of a write).'''
+        width = len(self.fields)
+        deadline = None
+        attempt = 0
+        while True:
+            seq = self.__seq[0]
+            if not seq & 1:
+                timestamp = self.__timestamp[0]
+                values = self.__values.tolist()
+                if self.__seq[0] == seq:
+                    break
+            attempt += 1
+            if attempt >= _SPINS:
+                if deadline is None:
+                    deadline = time.monotonic() + timeout
+                elif time.monotonic() > deadline:
+                    raise TimeoutError(f'No consistent snapshot in {self.name!r} within {timeout}s, is the publisher alive?')
+                time.sleep(_BACKOFF)
+        rows = tuple(tuple(values[pos:pos + width]) for pos in range(0, len(values), width))
+        return TelemetrySnapshot(sequence=seq // 2, timestamp=timestamp, values=rows)
+
+    def get(self, row: typing.Union[int, str], field: str) -> float:
+        '''Returns latest value of a field for a row given by index or label.'''
+        if isinstance(row, str):
+            row = self.labels.index(row)
+        return self.latest().values[row][self.fields.index(field)]
+
+    def close(self):
+        for view in (self.__seq, self.__timestamp, self.__values):
+            view.release()
+        self.__shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
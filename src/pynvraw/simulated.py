@@ -0,0 +1,544 @@
+'''Pure-Python simulated GPUs served through the nvapi backend interface.'''
+
+import math
+import threading
+import time
+import typing
+
+from .backend import Backend, _target
+from .nvapi_api import NVAPI_MAX_PHYSICAL_GPUS, NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, NVAPI_GPU_PUBLIC_CLOCK_MEMORY, \
+        NVAPI_GPU_PUBLIC_CLOCK_VIDEO, NV_GPU_CLOCK_FREQUENCIES_CURRENT_FREQ, NV_GPU_CLOCK_FREQUENCIES_BASE_CLOCK, \
+        NvPhysicalGpu, FAN_COOLER_CONTROL_MODE, PerfCapReason, PerformanceStateId, RamType, PowerChannelType, PowerRailType
+
+NVAPI_OK = 0
+NVAPI_INVALID_ARGUMENT = -5
+NVAPI_INVALID_HANDLE = -8
+NVAPI_INCOMPATIBLE_STRUCT_VERSION = -9
+NVAPI_NOT_SUPPORTED = -104
+
+class GpuModel:
+    '''Physical model of one simulated GPU.
+
+    Under `load` (0..1) the core runs at the fastest point of its voltage-frequency curve (plus overclock)
+    that fits into the power limit; dynamic power scales as frequency * voltage^2. Temperature follows
+    power with a first-order lag and a thermal resistance lowered by fan duty; above `temp_limit`
+    clocks are pulled down. Time runs by `clock` (time.monotonic by default) multiplied by `time_scale`.
+    '''
+    def __init__(self, name: str='NVIDIA GeForce RTX 3090 (simulated)', bus: int=1, slot: int=0, load: float=1.0,
+                 tdp: float=350.0, idle_power: float=30.0, memory_power: float=40.0, ambient: float=25.0,
+                 thermal_resistance: float=0.25, fan_cooling: float=1.5, thermal_time: float=20.0, temp_limit: float=83.0,
+                 fans: int=2, cooler_api: str='rtx', sensors: int=10, memory_mb: int=24576, device_id: int=0x2204,
+                 clock: typing.Callable[[], float]=time.monotonic, time_scale: float=1.0):
+        if cooler_api not in ('rtx', 'gtx'):
+            raise ValueError(f'Unknown cooler api {cooler_api!r}, expected "rtx" or "gtx"')
+        self.name = name
+        self.bus = bus
+        self.slot = slot
+        self.load = load
+        self.tdp = tdp
+        self.idle_power = idle_power
+        self.memory_power = memory_power
+        self.ambient = ambient
+        self.thermal_resistance = thermal_resistance
+        self.fan_cooling = fan_cooling
+        self.thermal_time = thermal_time
+        self.temp_limit = temp_limit
+        self.fans = 1 if cooler_api == 'gtx' else fans
+        self.cooler_api = cooler_api
+        self.sensors = sensors
+        self.memory_mb = memory_mb
+        self.device_id = device_id
+        self.clock = clock
+        self.time_scale = time_scale
+        self.lock = threading.RLock()
+
+        # voltage-frequency curve: 100 points from 0.7V@800MHz to 1.1V@2100MHz, boosting up to 1.05V
+        self.curve_voltage = [0.7 + 0.4 * i / 99 for i in range(100)]
+        self.curve_freq = [round(800.0 + 1300.0 * i / 99, 3) for i in range(100)] # whole kHz as in the driver
+        self.curve_delta = [0.0] * 100
+        self.max_voltage = 1.05
+        self.base_clock = 1395.0
+        self.idle_clock = 210.0
+        self.memory_clock = 9751.0
+        self.idle_memory_clock = 405.0
+        self.core_offset = 0.0
+        self.memory_offset = 0.0
+        self.offset_range = (-1000.0, 1000.0)
+        self.power_limit = 100.0
+        self.power_limit_range = (50.0, 120.0)
+        self.fan_manual = None
+        self.fan_max_rpm = 3000
+
+        self.__dyn_coeff = (0.97 * tdp - idle_power - memory_power) / (1950.0 * 1.05 ** 2)
+        self.temp = ambient
+        self.fan_level = 30.0
+        self.energy_mj = 0.0
+        self.timer_ns = 0
+        self.cap_timers_ns = [0, 0, 0]
+        self.__last = clock()
+        self.__point = None
+        self.__compute()
+
+    def __compute(self):
+        '''Finds the operating point for current settings and temperature.'''
+        if self.load < 0.05:
+            core, voltage = self.idle_clock, self.curve_voltage[0]
+            memory = self.idle_memory_clock
+            power = self.idle_power + self.__dyn_coeff * self.load * core * voltage ** 2 + 0.2 * self.memory_power
+            self.__point = (core, memory, voltage, power, PerfCapReason.NO_LOAD, PerformanceStateId.P8_HDVideoPlayback)
+            return
+        memory = self.memory_clock + self.memory_offset
+        limit = self.tdp * self.power_limit / 100
+        points = sorted(((self.curve_freq[i] + self.curve_delta[i] + self.core_offset, -self.curve_voltage[i], i)
+                         for i in range(len(self.curve_freq)) if self.curve_voltage[i] <= self.max_voltage + 1e-9), reverse=True)
+        reason = PerfCapReason.VOLTAGE
+        if self.temp > self.temp_limit:
+            # drop one curve point per degree above the limit
+            points = points[min(int(self.temp - self.temp_limit) + 1, len(points) - 1):]
+            reason = PerfCapReason.TEMPERATURE
+        for core, neg_voltage, _ in points:
+            voltage = -neg_voltage
+            power = self.idle_power + self.memory_power * memory / self.memory_clock + self.__dyn_coeff * self.load * core * voltage ** 2
+            if power <= limit:
+                break
+            reason = PerfCapReason.POWER
+        self.__point = (core, memory, voltage, min(power, max(limit, self.idle_power)), reason, PerformanceStateId.P0_3DPerformance)
+
+    def update(self):
+        '''Advances the model to current time.'''
+        now = self.clock()
+        dt = (now - self.__last) * self.time_scale
+        self.__last = now
+        if dt <= 0:
+            return
+        _, _, _, power, reason, _ = self.__point
+        self.energy_mj += power * dt * 1000
+        self.timer_ns += int(dt * 1e9)
+        for idx, flag in enumerate((PerfCapReason.POWER, PerfCapReason.TEMPERATURE, PerfCapReason.VOLTAGE)):
+            if reason & flag:
+                self.cap_timers_ns[idx] += int(dt * 1e9)
+        steady = self.ambient + power * self.thermal_resistance / (1 + self.fan_cooling * self.fan_level / 100)
+        self.temp += (steady - self.temp) * (1 - math.exp(-dt / self.thermal_time))
+        if self.fan_manual is None:
+            self.fan_level = min(max(30 + (self.temp - 50) * 2.5, 30), 100)
+        else:
+            self.fan_level = self.fan_manual
+        self.__compute()
+
+    @property
+    def core_clock(self) -> float:
+        return self.__point[0]
+    @property
+    def current_memory_clock(self) -> float:
+        return self.__point[1]
+    @property
+    def voltage(self) -> float:
+        return self.__point[2]
+    @property
+    def power(self) -> float:
+        return self.__point[3]
+    @property
+    def perf_limit(self) -> PerfCapReason:
+        return self.__point[4]
+    @property
+    def pstate(self) -> PerformanceStateId:
+        return self.__point[5]
+
+    def temperatures(self) -> typing.List[float]:
+        '''Values of thermal sensors: core, hotspot, then board sensors and memory at indices 8 and 9.'''
+        hotspot = self.temp + 12 * self.power / self.tdp
+        memory = self.temp + 6 + 10 * self.load
+        result = [self.temp, hotspot] + [self.temp - 5] * 6 + [memory, memory - 2]
+        return (result + [self.temp - 5] * 32)[:self.sensors]
+
+def _versioned(value, *versions):
+    return (value.version >> 16) in versions
+
+class SimulatedBackend(Backend):
+    '''Backend serving nvapi calls from GpuModel-s, each call takes `latency` seconds (GIL released while waiting).
+
+    nvapi can enumerate at most NVAPI_MAX_PHYSICAL_GPUS handles, more models are reachable through `handles`.
+    '''
+    DRIVER_VERSION = 53141
+    DRIVER_BRANCH = b'r530_00'
+
+    def __init__(self, gpus: typing.Union[int, typing.Sequence[GpuModel]]=1, latency: float=0.0):
+        if isinstance(gpus, int):
+            gpus = [GpuModel(bus=idx + 1) for idx in range(gpus)]
+        self.gpus = list(gpus)
+        self.latency = latency
+
+    @property
+    def handles(self) -> typing.List[NvPhysicalGpu]:
+        '''Handles of all simulated GPUs.'''
+        return [NvPhysicalGpu(unused=idx + 1) for idx in range(len(self.gpus))]
+
+    def resolve(self, method) -> typing.Optional[typing.Callable]:
+        handler = getattr(self, '_' + method.name.strip(), None)
+        if handler is None:
+            return None
+        takes_gpu = getattr(handler, 'takes_gpu', False)
+        def simulated(*args):
+            if self.latency > 0:
+                time.sleep(self.latency)
+            args = [arg if target is None else target for arg, target in zip(args, map(_target, args))]
+            if not takes_gpu:
+                return handler(*args)
+            idx = args[0].unused - 1
+            if not 0 <= idx < len(self.gpus):
+                return NVAPI_INVALID_HANDLE
+            gpu = self.gpus[idx]
+            with gpu.lock:
+                gpu.update()
+                return handler(gpu, *args[1:])
+        return simulated
+
+    def _gpu(func):
+        func.takes_gpu = True
+        return func
+
+    def _NvAPI_Initialize(self):
+        return NVAPI_OK
+
+    def _NvAPI_Unload(self):
+        return NVAPI_OK
+
+    def _NvAPI_SYS_GetDriverAndBranchVersion(self, version, branch):
+        version.value = self.DRIVER_VERSION
+        branch.value = self.DRIVER_BRANCH
+        return NVAPI_OK
+
+    def _NvAPI_EnumPhysicalGPUs(self, gpus, count):
+        handles = self.handles[:NVAPI_MAX_PHYSICAL_GPUS]
+        for idx, handle in enumerate(handles):
+            gpus[idx] = handle
+        count.value = len(handles)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetBusId(self, gpu, value):
+        value.value = gpu.bus
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetBusSlotId(self, gpu, value):
+        value.value = gpu.slot
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetPCIIdentifiers(self, gpu, device, subsystem, revision, ext_device):
+        device.value = (gpu.device_id << 16) | 0x10DE
+        subsystem.value = 0x147010DE
+        revision.value = 0xA1
+        ext_device.value = gpu.device_id
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetFullName(self, gpu, name):
+        name.value = gpu.name.encode('utf8')[:len(name) - 1]
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetThermalSettings(self, gpu, index, value):
+        if not _versioned(value, 2):
+            return NVAPI_INCOMPATIBLE_STRUCT_VERSION
+        value.count = 1
+        value.sensor[0].controller = 1
+        value.sensor[0].defaultMinTemp = -256
+        value.sensor[0].defaultMaxTemp = int(gpu.temp_limit) + 10
+        value.sensor[0].currentTemp = int(gpu.temp)
+        value.sensor[0].target = 1
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_QueryThermalSensors(self, gpu, value):
+        if value.mask >> gpu.sensors:
+            return NVAPI_INVALID_ARGUMENT
+        for idx, temp in enumerate(gpu.temperatures()):
+            if value.mask & (1 << idx):
+                value._sensors[idx] = int(temp * 256)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetCoolerSettings(self, gpu, target, value):
+        if gpu.cooler_api != 'gtx':
+            return NVAPI_NOT_SUPPORTED
+        value.count = 1
+        cooler = value.coolers[0]
+        cooler.default_min = cooler.current_min = 30
+        cooler.default_max = cooler.current_max = 100
+        cooler.current_level = int(gpu.fan_level)
+        cooler.current_policy = 1 if gpu.fan_manual is not None else 0
+        cooler._target = 1
+        cooler.active = 1
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_SetCoolerLevels(self, gpu, cooler, value):
+        if gpu.cooler_api != 'gtx':
+            return NVAPI_NOT_SUPPORTED
+        gpu.fan_manual = gpu.fan_level = float(value.levels[0].level)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_RestoreCoolerSettings(self, gpu, coolers, count):
+        gpu.fan_manual = None
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_ClientFanCoolersGetInfo(self, gpu, value):
+        if gpu.cooler_api != 'rtx':
+            return NVAPI_NOT_SUPPORTED
+        value.supported = True
+        value.count = gpu.fans
+        for idx in range(gpu.fans):
+            value._entries[idx].coolerId = idx + 1
+            value._entries[idx].maxRpm = gpu.fan_max_rpm
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_ClientFanCoolersGetStatus(self, gpu, value):
+        if gpu.cooler_api != 'rtx':
+            return NVAPI_NOT_SUPPORTED
+        value.count = gpu.fans
+        for idx in range(gpu.fans):
+            entry = value._entries[idx]
+            entry.coolerId = idx + 1
+            entry.currentRpm = int(gpu.fan_max_rpm * gpu.fan_level / 100)
+            entry.minLevel = 30
+            entry.maxLevel = 100
+            entry.level = int(gpu.fan_level)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_ClientFanCoolersGetControl(self, gpu, value):
+        if gpu.cooler_api != 'rtx':
+            return NVAPI_NOT_SUPPORTED
+        value.count = gpu.fans
+        for idx in range(gpu.fans):
+            entry = value._entries[idx]
+            entry.coolerId = idx + 1
+            entry.level = int(gpu.fan_level)
+            entry.mode = FAN_COOLER_CONTROL_MODE.AUTO if gpu.fan_manual is None else FAN_COOLER_CONTROL_MODE.MANUAL
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_ClientFanCoolersSetControl(self, gpu, value):
+        if gpu.cooler_api != 'rtx':
+            return NVAPI_NOT_SUPPORTED
+        if value.count > gpu.fans:
+            return NVAPI_INVALID_ARGUMENT
+        # the model has one fan speed for all fans, the first entry decides
+        entry = value._entries[0]
+        if entry._mode == FAN_COOLER_CONTROL_MODE.MANUAL:
+            gpu.fan_manual = gpu.fan_level = float(min(entry.level, 100))
+        else:
+            gpu.fan_manual = None
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetAllClockFrequencies(self, gpu, value):
+        if value.ClockType == NV_GPU_CLOCK_FREQUENCIES_CURRENT_FREQ:
+            core, memory = gpu.core_clock, gpu.current_memory_clock
+        elif value.ClockType == NV_GPU_CLOCK_FREQUENCIES_BASE_CLOCK:
+            core, memory = gpu.base_clock + gpu.core_offset, gpu.memory_clock + gpu.memory_offset
+        else:
+            core, memory = max(gpu.curve_freq) + gpu.core_offset, gpu.memory_clock + gpu.memory_offset
+        for domain, freq in ((NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, core), (NVAPI_GPU_PUBLIC_CLOCK_MEMORY, memory),
+                             (NVAPI_GPU_PUBLIC_CLOCK_VIDEO, core * 0.9)):
+            value.domain[domain].bIsPresent = 1
+            value.domain[domain].frequency = int(freq * 1000)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetAllClocks(self, gpu, value):
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetPstates20(self, gpu, value):
+        value.bIsEditable = 1
+        value.numPstates = 2
+        value.numClocks = 2
+        value.numBaseVoltages = 1
+        for pstate, pstateId in zip(value._pstates, (PerformanceStateId.P0_3DPerformance, PerformanceStateId.P8_HDVideoPlayback)):
+            pstate._pstateId = pstateId
+            pstate.bIsEditable = 1
+            for clock, domain, offset, freq in zip(pstate._clocks, (NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, NVAPI_GPU_PUBLIC_CLOCK_MEMORY),
+                                                   (gpu.core_offset, gpu.memory_offset), (gpu.base_clock, gpu.memory_clock)):
+                clock._domainId = domain
+                clock._typeId = 0
+                clock.bIsEditable = 1
+                clock.freqDelta_kHz.value = int(offset * 1000)
+                clock.freqDelta_kHz.valueMin = int(gpu.offset_range[0] * 1000)
+                clock.freqDelta_kHz.valueMax = int(gpu.offset_range[1] * 1000)
+                clock._data._singleFreq = int(freq * 1000)
+            pstate._baseVoltages[0].volt_uV = int(gpu.max_voltage * 1e6)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_SetPstates20(self, gpu, value):
+        if value.numPstates < 1 or value._pstates[0]._pstateId != PerformanceStateId.P0_3DPerformance:
+            return NVAPI_INVALID_ARGUMENT
+        offsets = {}
+        for clock in value._pstates[0]._clocks[:value.numClocks]:
+            delta = clock.freqDelta_kHz.value / 1000
+            if not gpu.offset_range[0] <= delta <= gpu.offset_range[1]:
+                return NVAPI_INVALID_ARGUMENT
+            offsets[clock._domainId] = delta
+        gpu.core_offset = offsets.get(NVAPI_GPU_PUBLIC_CLOCK_GRAPHICS, gpu.core_offset)
+        gpu.memory_offset = offsets.get(NVAPI_GPU_PUBLIC_CLOCK_MEMORY, gpu.memory_offset)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_ClientPowerPoliciesGetInfo(self, gpu, value):
+        value.valid = 1
+        value.count = 1
+        entry = value._entries[0]
+        entry.pstate = 0
+        entry.min_power = int(gpu.power_limit_range[0] * 1000)
+        entry.def_power = 100000
+        entry.max_power = int(gpu.power_limit_range[1] * 1000)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_ClientPowerPoliciesGetStatus(self, gpu, value):
+        value.count = 1
+        value._entries[0].power = int(gpu.power_limit * 1000)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_ClientPowerPoliciesSetStatus(self, gpu, value):
+        limit = value._entries[0].power / 1000
+        if value.count < 1 or not gpu.power_limit_range[0] <= limit <= gpu.power_limit_range[1]:
+            return NVAPI_INVALID_ARGUMENT
+        gpu.power_limit = limit
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_ClientPowerTopologyGetStatus(self, gpu, value):
+        value.count = 1
+        value._entries[0].domain = 0
+        value._entries[0]._power = int(gpu.power / gpu.tdp * 100 * 1000)
+        return NVAPI_OK
+
+    _RAILS = ((PowerRailType.IN_TOTAL_BOARD, 1.0, 12.0), (PowerRailType.OUT_NVVDD, 0.7, None),
+              (PowerRailType.OUT_FBVDD, 0.2, 1.35), (PowerRailType.IN_PEX12V, 0.15, 12.0))
+
+    @_gpu
+    def _NvAPI_GPU_PowerMonitorGetInfo(self, gpu, value):
+        value.isSupported = True
+        value._samplingPeriod = 100
+        value.samplingCount = 1
+        value.channelMask = (1 << len(self._RAILS)) - 1
+        value.totalGpuPowerChannelMask = 1
+        value.totalGpuChannelIndex = 0
+        for channel, (rail, _, _) in zip(value.channels, self._RAILS):
+            channel._type = PowerChannelType.SENSOR
+            channel._rail = rail
+            channel._limit = int(gpu.tdp * 1000)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_PowerMonitorGetStatus(self, gpu, value):
+        value.channelMask &= (1 << len(self._RAILS)) - 1
+        value._totalPower = int(gpu.power * 1000)
+        for idx, (entry, (_, share, volts)) in enumerate(zip(value.entries, self._RAILS)):
+            if not value.channelMask & (1 << idx):
+                continue
+            power = gpu.power * share
+            volts = gpu.voltage if volts is None else volts
+            entry._powerAvg = entry._powerMin = entry._powerMax = int(power * 1000)
+            entry._current = int(power / volts * 1000)
+            entry._voltage = int(volts * 1e6)
+            entry._energy = int(gpu.energy_mj * share) & 0xFFFFFFFFFFFFFFFF
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetCurrentVoltage(self, gpu, value):
+        value._voltage = int(gpu.voltage * 1e6)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetClockBoostMask(self, gpu, value):
+        for idx in range(len(gpu.curve_freq)):
+            value.masks[idx // 32] |= 1 << (idx % 32)
+            value.clocks[idx]._type = 0
+            value.clocks[idx].enabled = True
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetVFPCurve(self, gpu, value):
+        for idx, (freq, voltage) in enumerate(zip(gpu.curve_freq, gpu.curve_voltage)):
+            if value.masks[idx // 32] & (1 << (idx % 32)):
+                value.clocks[idx]._type = 0
+                value.clocks[idx]._frequency = int(freq * 1000)
+                value.clocks[idx]._voltage = int(voltage * 1e6)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetClockBoostTable(self, gpu, value):
+        for idx, delta in enumerate(gpu.curve_delta):
+            if value.masks[idx // 32] & (1 << (idx % 32)):
+                value.clocks[idx]._type = 0
+                value.clocks[idx]._freqDelta = int(delta * 1000)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_SetClockBoostTable(self, gpu, value):
+        for idx in range(len(gpu.curve_delta)):
+            if value.masks[idx // 32] & (1 << (idx % 32)):
+                delta = value.clocks[idx]._freqDelta / 1000
+                if not gpu.offset_range[0] <= delta <= gpu.offset_range[1]:
+                    return NVAPI_INVALID_ARGUMENT
+                gpu.curve_delta[idx] = delta
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_PerfPoliciesGetStatus(self, gpu, value):
+        value._timer = gpu.timer_ns
+        value._limit = gpu.perf_limit
+        for idx, timer in enumerate(gpu.cap_timers_ns):
+            value._timers[idx] = timer
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetRamType(self, gpu, value):
+        value.value = RamType.GDDR6X
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetMemoryInfo(self, gpu, value):
+        if not _versioned(value, 1, 2, 3):
+            return NVAPI_INCOMPATIBLE_STRUCT_VERSION
+        total = gpu.memory_mb * 1024
+        value._dedicatedVideoMemory = value._availableDedicatedVideoMemory = total
+        value._systemVideoMemory = 0
+        value._sharedSystemMemory = total // 2
+        if hasattr(value, '_currentAvailableDedicatedVideoMemory'):
+            value._currentAvailableDedicatedVideoMemory = int(total * (1 - 0.8 * gpu.load))
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetClockBoostLock(self, gpu, value):
+        value.count = 0
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetCurrentPstate(self, gpu, value):
+        value.value = gpu.pstate
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_GetDynamicPstatesInfoEx(self, gpu, value):
+        value._flags = 1
+        for domain, percent in enumerate((gpu.load * 100, gpu.load * 60, 0, gpu.load * 10)):
+            value._utilization[domain]._present = 1
+            value._utilization[domain].percent = int(percent)
+        return NVAPI_OK
+
+    @_gpu
+    def _NvAPI_GPU_QueryActiveApps(self, gpu, apps, count):
+        count.value = 0
+        return NVAPI_OK
+
+    del _gpu
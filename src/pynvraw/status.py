@@ -1,4 +1,5 @@
 import re
+import threading
 
 _nvapi_status_decl = '''
 typedef enum _NvAPI_Status
@@ -172,9 +173,15 @@ class NvStatus:
         return obj
     @classmethod
     def by_value(cls, value):
+        if value == 0:
+            return NVAPI_OK
+        if not _by_value:
+            _load()
         return _by_value[value]
     @classmethod
     def by_name(cls, value):
+        if not _by_name:
+            _load()
         return _by_name[value]
     
     def __repr__(self) -> str:
@@ -196,9 +203,22 @@ class NvStatus:
     def __hash__(self):
         return hash(self.value)
 
-_statuses = [NvStatus(x) for x in _nvapi_status_decl.splitlines() if 'NVAPI_' in x]
-_by_value = {s.value: s for s in _statuses}
-_by_name = {s.name: s for s in _statuses}
+_by_value = {}
+_by_name = {}
+_load_lock = threading.Lock()
+
+def _load():
+    '''Parses the status table, which is only needed once some call has failed.'''
+    with _load_lock:
+        if _by_value:
+            return
+        statuses = [NVAPI_OK if ' NVAPI_OK ' in x else NvStatus(x) for x in _nvapi_status_decl.splitlines() if 'NVAPI_' in x]
+        _by_name.update({s.name: s for s in statuses})
+        _by_value.update({s.value: s for s in statuses})
+
+# raw values of NVAPI_NO_IMPLEMENTATION, NVAPI_NOT_SUPPORTED and NVAPI_FUNCTION_NOT_FOUND,
+# checked on hot paths without touching the status table
+UNSUPPORTED_STATUS_VALUES = frozenset((-3, -104, -136))
 
 class NvError(Exception):
     def __init__(self, msg, status, *args, **kw):
@@ -206,4 +226,4 @@ class NvError(Exception):
         super().__init__(msg, *args, **kw)
         self.status = status
 
-NVAPI_OK = NvStatus.by_name('NVAPI_OK')
+NVAPI_OK = NvStatus(next(x for x in _nvapi_status_decl.splitlines() if ' NVAPI_OK ' in x))
@@ -0,0 +1,171 @@
+'''Append-only memory-mapped columnar on-disk telemetry store.
+
+A store is a directory with:
+    meta.json       {"version": 1, "fields": [...]}
+    rows            uint64 count of committed rows
+    timestamp.f64   float64 timestamps, non-decreasing
+    <field>.f64     float64 values of each field, NaN if unsupported
+Column files are grown in chunks of rows and mapped into memory, so queries return zero-copy views.
+'''
+
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import typing
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_ROWS = struct.Struct('<Q')
+_VERSION = 1
+
+class _Column:
+    def __init__(self, path: str, writable: bool):
+        self.path = path
+        self.writable = writable
+        self.file = open(path, 'r+b' if writable else 'rb')
+        self.capacity = 0
+        self.map = None
+        self.view = None
+
+    def ensure(self, rows: int, chunk_rows: int=0):
+        '''Makes sure first `rows` values are mapped, growing the file if writable.'''
+        if rows <= self.capacity:
+            return
+        if self.writable:
+            capacity = -(-rows // chunk_rows) * chunk_rows
+            if os.name != 'nt':
+                # on Windows mapping more than the file size extends the file
+                self.file.truncate(8 * capacity)
+        else:
+            capacity = os.fstat(self.file.fileno()).st_size // 8
+        # a new mapping is made instead of resizing the old one so views given out earlier stay valid
+        self.map = mmap.mmap(self.file.fileno(), 8 * capacity, access=mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ)
+        self.view = memoryview(self.map).cast('d')
+        self.capacity = capacity
+
+    def slice(self, lo: int, hi: int):
+        if self.map is None:
+            return np.empty(0, dtype=np.float64) if np is not None else memoryview(b'').cast('d')
+        if np is not None:
+            return np.frombuffer(self.map, dtype=np.float64, count=hi - lo, offset=8 * lo)
+        return self.view[lo:hi]
+
+    def close(self):
+        self.view = self.map = None
+        self.file.close()
+
+class ColumnStore:
+    '''Memory-mapped columnar store of float64 metrics indexed by timestamp.
+
+    Opened with `fields` it is writable (created if missing), otherwise read-only;
+    a read-only store picks up rows appended by a writer in another process on each query.
+    Query results are NumPy arrays viewing the mapped files (memoryview-s if NumPy is unavailable).
+    '''
+    def __init__(self, path: str, fields: typing.Optional[typing.Sequence[str]]=None, chunk_rows: int=65536):
+        self.path = path
+        self.writable = fields is not None
+        self.chunk_rows = chunk_rows
+        meta_path = os.path.join(path, 'meta.json')
+        if self.writable and not os.path.exists(meta_path):
+            self.__create(fields)
+        with open(meta_path, encoding='utf8') as inp:
+            meta = json.load(inp)
+        if meta['version'] != _VERSION:
+            raise ValueError(f'Unsupported store version {meta["version"]}')
+        self.fields = tuple(meta['fields'])
+        if self.writable and tuple(fields) != self.fields:
+            raise ValueError(f'Store at {path} has fields {self.fields}, not {tuple(fields)}')
+
+        self.__rows_file = open(os.path.join(path, 'rows'), 'r+b' if self.writable else 'rb')
+        self.__rows_map = mmap.mmap(self.__rows_file.fileno(), _ROWS.size, access=mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ)
+        self.__timestamps = _Column(os.path.join(path, 'timestamp.f64'), self.writable)
+        self.__columns = {name: _Column(os.path.join(path, f'{name}.f64'), self.writable) for name in self.fields}
+        self.__ordered = tuple(self.__columns[name] for name in self.fields)
+        self.__last = -math.inf
+        self.__refresh()
+        if len(self):
+            self.__last = self.__timestamps.view[len(self) - 1]
+
+    def __create(self, fields: typing.Sequence[str]):
+        bad = [name for name in fields if not name.isidentifier()]
+        if bad or 'timestamp' in fields:
+            raise ValueError(f'Bad field names: {", ".join(bad or ["timestamp"])}')
+        os.makedirs(self.path, exist_ok=True)
+        for name in ('timestamp',) + tuple(fields):
+            open(os.path.join(self.path, f'{name}.f64'), 'wb').close()
+        with open(os.path.join(self.path, 'rows'), 'wb') as out:
+            out.write(_ROWS.pack(0))
+        # meta goes last so a half-created store is not picked up
+        with open(os.path.join(self.path, 'meta.json'), 'w', encoding='utf8') as out:
+            json.dump({'version': _VERSION, 'fields': list(fields)}, out)
+
+    def __len__(self):
+        return self.__count
+
+    def __refresh(self):
+        self.__count = _ROWS.unpack_from(self.__rows_map, 0)[0]
+        for column in (self.__timestamps,) + self.__ordered:
+            column.ensure(self.__count, self.chunk_rows)
+
+    def append(self, timestamp: float, values: typing.Sequence[float]):
+        '''Appends one row. Compatible with Sampler's `sink`: a timestamp older than the last stored one
+        (wall clock stepped back) is stored as the last one, keeping the column sorted for bisection.'''
+        if not self.writable:
+            raise ValueError('Store is opened read-only')
+        timestamp = max(timestamp, self.__last)
+        if len(values) != len(self.__ordered):
+            raise ValueError(f'Expected {len(self.__ordered)} values, got {len(values)}')
+        row = self.__count
+        for column in (self.__timestamps,) + self.__ordered:
+            column.ensure(row + 1, self.chunk_rows)
+        self.__timestamps.view[row] = timestamp
+        for column, value in zip(self.__ordered, values):
+            column.view[row] = math.nan if value is None else value
+        # publishing the row count commits the row for readers
+        _ROWS.pack_into(self.__rows_map, 0, row + 1)
+        self.__count = row + 1
+        self.__last = timestamp
+
+    def flush(self):
+        for column in (self.__timestamps,) + self.__ordered:
+            if column.map is not None:
+                column.map.flush()
+        self.__rows_map.flush()
+
+    def bounds(self, start: typing.Optional[float]=None, end: typing.Optional[float]=None) -> typing.Tuple[int, int]:
+        '''Returns [lo, hi) row range with start <= timestamp < end, found by bisection.'''
+        if not self.writable:
+            self.__refresh()
+        timestamps = self.__timestamps.view[:self.__count] if self.__count else ()
+        lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+        hi = self.__count if end is None else bisect.bisect_left(timestamps, end, lo)
+        return lo, hi
+
+    def query(self, start: typing.Optional[float]=None, end: typing.Optional[float]=None,
+              fields: typing.Optional[typing.Sequence[str]]=None) -> typing.Dict[str, typing.Any]:
+        '''Returns zero-copy views of timestamps and fields for rows with start <= timestamp < end.'''
+        lo, hi = self.bounds(start, end)
+        result = {'timestamp': self.__timestamps.slice(lo, hi)}
+        for name in (self.fields if fields is None else fields):
+            result[name] = self.__columns[name].slice(lo, hi)
+        return result
+
+    def close(self):
+        if self.writable:
+            self.flush()
+        for column in (self.__timestamps,) + self.__ordered:
+            column.close()
+        self.__rows_map.close()
+        self.__rows_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
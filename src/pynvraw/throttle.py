@@ -0,0 +1,124 @@
+'''Throttle accounting from the driver's cumulative per-reason cap timers.
+
+NV_GPU_PERFORMANCE_STATUS carries nanoseconds the GPU spent capped by POWER, TEMPERATURE and VOLTAGE since
+driver start, so time lost to each reason is exact however rarely it is read. Reads also compare
+the current cap reasons with the previous read to emit start/stop edges; a stop edge carries how long
+the cap lasted as measured by the driver timer, so only edge timestamps depend on the read rate.
+A driver restart (timers going backwards) is counted in totals.restarts; time counted before it is kept.
+'''
+
+import collections
+import threading
+import time
+import typing
+
+from .gpu import Gpu
+from .nvapi_api import NV_GPU_PERFORMANCE_STATUS, PerfCapReason
+
+REASONS = tuple(PerfCapReason[name] for name in NV_GPU_PERFORMANCE_STATUS.TIMER_REASONS)
+
+class ThrottleEdge(typing.NamedTuple):
+    reason: PerfCapReason
+    started: bool # True when the cap engaged, False when it was released
+    timestamp: float # time.time() of the read which noticed the edge
+    duration: typing.Optional[float] # seconds the cap lasted (stop edges only)
+
+class ThrottleTotals(typing.NamedTuple):
+    elapsed: float # driver timer seconds since reset
+    capped: typing.Dict[PerfCapReason, float] # seconds capped by each reason since reset
+    restarts: int = 0 # driver restarts seen since reset, time between the last read before and the restart is lost
+
+    def fraction(self, reason: PerfCapReason) -> float:
+        '''Share of elapsed time spent capped by `reason`.'''
+        return self.capped[reason] / self.elapsed if self.elapsed > 0 else 0.0
+
+class ThrottleAccountant:
+    '''Turns performance status reads of a GPU into capped time totals and a stream of throttle edges.
+
+    Call update() at any rate (e.g. once per training step); edges are kept in a deque of `max_edges`
+    (oldest dropped) to be taken by drain(), and also passed to `on_edge(edge)` if given.
+    '''
+    def __init__(self, gpu: Gpu, max_edges: int=4096, on_edge: typing.Optional[typing.Callable[[ThrottleEdge], None]]=None):
+        self.gpu = gpu
+        self.on_edge = on_edge
+        self.__edges = collections.deque(maxlen=max_edges)
+        self.__lock = threading.Lock()
+        self.__base = None # (timer ns, cap timers ns) at reset or at the last driver restart
+        self.__carried = None # (timer ns, cap timers ns) accumulated before driver restarts since reset
+        self.__restarts = 0
+        self.__last = None # (timer ns, cap timers ns, limit) at previous update
+        self.__since = {} # reason -> its cap timer ns when it engaged
+
+    def __read(self) -> typing.Tuple[int, typing.Tuple[int], int]:
+        status = self.gpu.buffers.read('get_performance_status')
+        return status._timer, tuple(status._timers), status._limit
+
+    def reset(self):
+        '''Starts totals from now on, keeping edges not drained yet.'''
+        timer, timers, limit = self.__read()
+        with self.__lock:
+            self.__base = timer, timers
+            self.__carried = 0, (0,) * len(timers)
+            self.__restarts = 0
+            if self.__last is None:
+                self.__last = timer, timers, limit
+                self.__since = {reason: timers[idx] for idx, reason in enumerate(REASONS) if limit & reason}
+
+    def update(self) -> ThrottleTotals:
+        '''Reads the GPU, records edges since previous update, returns totals since reset.'''
+        timer, timers, limit = self.__read()
+        now = time.time()
+        edges = []
+        with self.__lock:
+            if self.__base is None:
+                self.__base = timer, timers
+                self.__carried = 0, (0,) * len(timers)
+            if self.__last is not None and timer < self.__last[0]:
+                # driver restarted, timers count from zero again: keep what was counted before it
+                self.__carried = self.__totals_ns(self.__last[0], self.__last[1])
+                self.__base = 0, (0,) * len(timers)
+                self.__restarts += 1
+                self.__since = {reason: 0 for reason in self.__since}
+            previous = self.__last[2] if self.__last is not None else 0
+            for idx, reason in enumerate(REASONS):
+                was, now_capped = bool(previous & reason), bool(limit & reason)
+                if now_capped and not was:
+                    self.__since[reason] = timers[idx]
+                    edges.append(ThrottleEdge(reason=reason, started=True, timestamp=now, duration=None))
+                elif was and not now_capped:
+                    start = self.__since.pop(reason, timers[idx])
+                    edges.append(ThrottleEdge(reason=reason, started=False, timestamp=now,
+                                              duration=max(timers[idx] - start, 0) / 1e9))
+            self.__last = timer, timers, limit
+            self.__edges.extend(edges)
+            totals = self.__totals(timer, timers)
+        if self.on_edge is not None:
+            for edge in edges:
+                self.on_edge(edge)
+        return totals
+
+    def __totals_ns(self, timer: int, timers: typing.Tuple[int]) -> typing.Tuple[int, typing.Tuple[int]]:
+        base_timer, base_timers = self.__base
+        carried_timer, carried_timers = self.__carried
+        return (carried_timer + max(timer - base_timer, 0),
+                tuple(carried + max(value - base, 0) for carried, value, base in zip(carried_timers, timers, base_timers)))
+
+    def __totals(self, timer: int, timers: typing.Tuple[int]) -> ThrottleTotals:
+        elapsed, capped = self.__totals_ns(timer, timers)
+        return ThrottleTotals(elapsed=elapsed / 1e9, capped={reason: capped[idx] / 1e9 for idx, reason in enumerate(REASONS)},
+                              restarts=self.__restarts)
+
+    @property
+    def totals(self) -> ThrottleTotals:
+        '''Totals as of the last update.'''
+        with self.__lock:
+            if self.__last is None:
+                raise RuntimeError('ThrottleAccountant has not read the GPU yet')
+            return self.__totals(self.__last[0], self.__last[1])
+
+    def drain(self) -> typing.List[ThrottleEdge]:
+        '''Returns edges recorded so far and forgets them.'''
+        with self.__lock:
+            edges = list(self.__edges)
+            self.__edges.clear()
+        return edges
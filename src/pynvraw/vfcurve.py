@@ -0,0 +1,120 @@
+'''Voltage-frequency curve editing: load all enabled points at once, edit offsets in bulk, write back in one call.
+
+The driver reports the curve (NvAPI_GPU_GetVFPCurve) without user offsets, which live in the boost table
+as a per-point frequency delta; the effective frequency of a point is their sum. Edits only change deltas.
+'''
+
+import typing
+
+from .gpu import Gpu
+from .nvapi_api import NV_GPU_CLOCKBOOST_MASK, NV_GPU_CLOCKBOOST_TABLE
+
+class VfPoint(typing.NamedTuple):
+    index: int # position in the 255-point driver tables
+    voltage: float # V
+    frequency: float # MHz, without offset
+    delta: float # MHz
+
+    @property
+    def effective(self) -> float:
+        return self.frequency + self.delta
+
+def _khz(mhz: float) -> int:
+    return int(round(mhz * 1000))
+
+class VfCurve:
+    '''Enabled points of a GPU's curve with editable deltas, see load().'''
+    def __init__(self, gpu: Gpu, mask: NV_GPU_CLOCKBOOST_MASK, indices: typing.Sequence[int],
+                 voltages: typing.Sequence[float], frequencies: typing.Sequence[float], deltas: typing.Sequence[float]):
+        self.gpu = gpu
+        self.mask = mask
+        self.indices = tuple(indices)
+        self.voltages = tuple(voltages)
+        self.frequencies = tuple(frequencies)
+        self.deltas = list(deltas)
+
+    @classmethod
+    def load(cls, gpu: Gpu) -> 'VfCurve':
+        '''Reads mask, curve and boost table of the GPU once.'''
+        api = gpu.api
+        mask = api.get_boost_mask(gpu.handle)
+        curve = api.get_vfp_curve(gpu.handle, mask)
+        table = api.get_boost_table(gpu.handle, mask)
+        indices = [idx for idx, clock in enumerate(mask.clocks) if clock.enabled]
+        return cls(gpu, mask, indices, voltages=[curve.clocks[idx]._voltage / 1e6 for idx in indices],
+                   frequencies=[curve.clocks[idx]._frequency / 1000.0 for idx in indices],
+                   deltas=[table.clocks[idx]._freqDelta / 1000.0 for idx in indices])
+
+    @property
+    def points(self) -> typing.Tuple[VfPoint]:
+        return tuple(VfPoint(*values) for values in zip(self.indices, self.voltages, self.frequencies, self.deltas))
+
+    @property
+    def effective(self) -> typing.Tuple[float]:
+        '''Effective frequency of each point in MHz.'''
+        return tuple(freq + delta for freq, delta in zip(self.frequencies, self.deltas))
+
+    def __selected(self, min_voltage: typing.Optional[float], max_voltage: typing.Optional[float]) -> typing.List[int]:
+        return [pos for pos, voltage in enumerate(self.voltages)
+                if (min_voltage is None or voltage >= min_voltage) and (max_voltage is None or voltage <= max_voltage)]
+
+    def shift(self, mhz: float, min_voltage: typing.Optional[float]=None, max_voltage: typing.Optional[float]=None) -> 'VfCurve':
+        '''Adds `mhz` to deltas of points within the voltage range (whole curve by default).'''
+        for pos in self.__selected(min_voltage, max_voltage):
+            self.deltas[pos] += mhz
+        return self
+
+    def set_offset(self, mhz: float, min_voltage: typing.Optional[float]=None, max_voltage: typing.Optional[float]=None) -> 'VfCurve':
+        '''Sets deltas of points within the voltage range to `mhz`.'''
+        for pos in self.__selected(min_voltage, max_voltage):
+            self.deltas[pos] = mhz
+        return self
+
+    def flatten_above(self, voltage: float, frequency: typing.Optional[float]=None) -> 'VfCurve':
+        '''Undervolts: points above `voltage` get the effective frequency `frequency` (by default that of
+        the highest point at or below `voltage`), so the GPU never needs more voltage to reach it.
+        With `frequency` given, the points at or below `voltage` which would exceed it are lowered too.'''
+        below = self.__selected(None, voltage)
+        if frequency is None:
+            if not below:
+                raise ValueError(f'No curve points at or below {voltage}V')
+            frequency = self.frequencies[below[-1]] + self.deltas[below[-1]]
+        else:
+            for pos in below:
+                if self.frequencies[pos] + self.deltas[pos] > frequency:
+                    self.deltas[pos] = frequency - self.frequencies[pos]
+        below = set(below)
+        for pos in range(len(self.voltages)):
+            if pos not in below:
+                self.deltas[pos] = frequency - self.frequencies[pos]
+        return self
+
+    def reset(self) -> 'VfCurve':
+        '''Drops all offsets.'''
+        self.deltas = [0.0] * len(self.deltas)
+        return self
+
+    def diff(self) -> typing.Dict[int, typing.Tuple[float, float]]:
+        '''Returns {point index: (live delta, edited delta)} of points whose delta differs from the GPU's table.'''
+        live = self.gpu.api.get_boost_table(self.gpu.handle, self.mask)
+        result = {}
+        for idx, delta in zip(self.indices, self.deltas):
+            current = live.clocks[idx]._freqDelta
+            if current != _khz(delta):
+                result[idx] = (current / 1000.0, delta)
+        return result
+
+    def write(self, force: bool=False) -> int:
+        '''Writes deltas of all points in one call if any differs from the live table (or if `force`),
+        returns number of points that differed.'''
+        changed = self.diff()
+        if not changed and not force:
+            return 0
+        table = NV_GPU_CLOCKBOOST_TABLE()
+        for idx in range(len(self.mask.masks)):
+            table.masks[idx] = self.mask.masks[idx]
+        for idx, delta in zip(self.indices, self.deltas):
+            table.clocks[idx]._type = self.mask.clocks[idx]._type
+            table.clocks[idx]._freqDelta = _khz(delta)
+        self.gpu.api.set_boost_table(self.gpu.handle, table)
+        return len(changed)